@@ -0,0 +1,352 @@
+from quart import Quart, g, request, jsonify
+from contextlib import asynccontextmanager
+from functools import wraps
+import asyncio
+import os
+import sqlite3
+import aiosqlite
+from pymongo import AsyncMongoClient, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
+from bson.objectid import ObjectId
+from leads import passwords
+from leads.auth import token_for, verify_token
+from leads.common import (DEDUPE_FIELDS, DEFAULT_USER, MAX_PAGE_LIMIT, SAMPLE_LEADS, decode_cursor, doc_to_lead,
+                          encode_cursor, lead_changes, lead_document, row_to_lead, validate_lead, with_dedupe_keys,
+                          with_search)
+from leads.mongo import STATUS_COUNT_PIPELINE, STATUS_COUNTERS, seeded_already, status_seed_requests
+from leads.schema import migrate
+from leads.sqlite import DB_PATH
+
+# asyncio build of the lead API: serve with an ASGI server, e.g.
+#   uvicorn app_async:app --host 0.0.0.0 --port 8000
+# Uses Mongo when MONGODB_URI is set, otherwise the SQLite file at DB_PATH.
+app = Quart(__name__)
+MONGODB_URI = os.environ.get('MONGODB_URI')
+MONGODB_DB = os.environ.get('MONGODB_DB', 'hashai')
+ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', '4'))
+COUNT_MODES = ('exact', 'estimated', 'none')
+
+
+class SQLiteStore:
+    # Fixed pool of aiosqlite connections, each running on its own thread
+    default_count_mode = 'exact'  # a trigger-maintained counter, as in leads/sqlite.py
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self.pool = asyncio.Queue()
+
+    async def start(self):
+        await asyncio.to_thread(self._migrate)
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            await conn.execute('PRAGMA journal_mode = WAL')
+            await conn.execute('PRAGMA synchronous = NORMAL')
+            await conn.execute('PRAGMA busy_timeout = 5000')
+            self.pool.put_nowait(conn)
+
+    async def stop(self):
+        while not self.pool.empty():
+            await self.pool.get_nowait().close()
+
+    def _migrate(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self.pool.get()
+        try:
+            yield conn
+        finally:
+            self.pool.put_nowait(conn)
+
+    def parse_id(self, lead_id):
+        return int(lead_id)
+
+    async def get_password_hash(self, email):
+        async with self.connection() as conn:
+            async with conn.execute('SELECT password FROM users WHERE email = ?', (email,)) as cur:
+                row = await cur.fetchone()
+        return row['password'] if row else None
+
+    async def set_password_hash(self, email, old, new):
+        async with self.connection() as conn:
+            await conn.execute('UPDATE users SET password = ? WHERE email = ? AND password = ?', (new, email, old))
+            await conn.commit()
+
+    async def list_leads(self, limit, offset, after_id, count_mode):
+        async with self.connection() as conn:
+            total = None
+            if count_mode != 'none':
+                async with conn.execute("SELECT value FROM counters WHERE name = 'leads'") as cur:
+                    total = (await cur.fetchone())[0]
+            if after_id is not None:
+                sql, params = 'SELECT * FROM leads WHERE id < ? ORDER BY id DESC LIMIT ?', (after_id, limit + 1)
+            else:
+                sql, params = 'SELECT * FROM leads ORDER BY id DESC LIMIT ? OFFSET ?', (limit + 1, offset)
+            async with conn.execute(sql, params) as cur:
+                rows = await cur.fetchall()
+        return [row_to_lead(row) for row in rows], total
+
+    async def get_lead(self, lead_id):
+        async with self.connection() as conn:
+            async with conn.execute('SELECT * FROM leads WHERE id = ?', (lead_id,)) as cur:
+                row = await cur.fetchone()
+        return row_to_lead(row) if row else None
+
+    async def add_lead(self, lead):
+        async with self.connection() as conn:
+            keys = with_dedupe_keys({'email': lead['email'], 'phone': lead['phone']})
+            async with conn.execute('INSERT INTO leads (name, email, phone, status, email_norm, phone_norm) '
+                                    'VALUES (?, ?, ?, ?, ?, ?) RETURNING *',
+                                    (lead['name'], lead['email'], lead['phone'], lead['status'], keys['email_norm'],
+                                     keys['phone_norm'])) as cur:
+                row = await cur.fetchone()
+            await conn.commit()
+        return row_to_lead(row)
+
+    async def update_lead(self, lead_id, changes):
+        changes = with_dedupe_keys(dict(changes))
+        assignments = ''.join(f'{key} = ?, ' for key in changes) + 'version = version + 1'
+        async with self.connection() as conn:
+            async with conn.execute(f'UPDATE leads SET {assignments} WHERE id = ? RETURNING *',
+                                    (*changes.values(), lead_id)) as cur:
+                row = await cur.fetchone()
+            await conn.commit()
+        return row_to_lead(row) if row else None
+
+    async def delete_lead(self, lead_id):
+        async with self.connection() as conn:
+            async with conn.execute('DELETE FROM leads WHERE id = ?', (lead_id,)) as cur:
+                deleted = cur.rowcount
+            await conn.commit()
+        return deleted > 0
+
+
+class MongoStore:
+    default_count_mode = 'estimated'  # as MongoRepository: count_documents scans the index
+
+    def __init__(self, uri, db_name):
+        self.client = AsyncMongoClient(uri)
+        self.db = self.client[db_name]
+
+    async def start(self):
+        # Same indexes and defaults as MongoRepository.init_schema; backfills of documents
+        # written before versioning, search and dedupe keys stay there
+        await self.db.users.create_index([('email', ASCENDING)], unique=True)
+        await self.db.leads.create_index([('status', ASCENDING), ('_id', DESCENDING)])
+        await self.db.leads.create_index([('email', ASCENDING)])
+        await self.db.leads.create_index([('search', ASCENDING)])
+        for key in DEDUPE_FIELDS.values():
+            await self.db.leads.create_index([(key, ASCENDING), ('_id', ASCENDING)])
+        # Seed a default user and sample leads if none
+        if await self.db.users.count_documents({}) == 0:
+            await self.db.users.update_one({'email': DEFAULT_USER['email']},
+                                           {'$setOnInsert': {'password': DEFAULT_USER['password']}}, upsert=True)
+        if await self.db.leads.count_documents({}) == 0:
+            await self.db.leads.insert_many([lead_document(dict(lead)) for lead in SAMPLE_LEADS])
+        if await self.db.counters.count_documents(STATUS_COUNTERS) == 0:
+            await self._seed_stats()
+
+    async def _seed_stats(self):
+        cursor = await self.db.leads.aggregate(STATUS_COUNT_PIPELINE, allowDiskUse=True)
+        requests = status_seed_requests({doc['_id']: doc['n'] async for doc in cursor})
+        if not requests:
+            return
+        try:
+            await self.db.counters.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            if not seeded_already(e):
+                raise
+
+    async def stop(self):
+        await self.client.close()
+
+    def parse_id(self, lead_id):
+        return ObjectId(lead_id)
+
+    async def get_password_hash(self, email):
+        user = await self.db.users.find_one({'email': email}, {'password': 1})
+        return user.get('password') if user else None
+
+    async def set_password_hash(self, email, old, new):
+        await self.db.users.update_one({'email': email, 'password': old}, {'$set': {'password': new}})
+
+    async def list_leads(self, limit, offset, after_id, count_mode):
+        if count_mode == 'none':
+            total = None
+        elif count_mode == 'exact':
+            total = await self.db.leads.count_documents({})
+        else:
+            total = await self.db.leads.estimated_document_count()
+        if after_id is not None:
+            cursor = self.db.leads.find({'_id': {'$lt': after_id}}, sort=[('_id', DESCENDING)]).limit(limit + 1)
+        else:
+            cursor = self.db.leads.find({}, sort=[('_id', DESCENDING)]).skip(offset).limit(limit + 1)
+        return [doc_to_lead(doc) for doc in await cursor.to_list(limit + 1)], total
+
+    async def get_lead(self, lead_id):
+        doc = await self.db.leads.find_one({'_id': lead_id})
+        return doc_to_lead(doc) if doc else None
+
+    async def _count_status(self, status, n):
+        # Same per-status counters as leads/mongo.py (GET /api/leads/stats)
+        await self.db.counters.update_one({'_id': 'status:' + status}, {'$inc': {'value': n}}, upsert=True)
+
+    async def add_lead(self, lead):
+        await self.db.leads.insert_one(lead_document(lead))
+        await self._count_status(lead['status'], 1)
+        return doc_to_lead(lead)
+
+    async def update_lead(self, lead_id, changes):
+        text_fields = {'name', 'email', 'phone'}
+        changes = with_dedupe_keys(dict(changes))
+        if text_fields <= changes.keys():
+            with_search(changes)
+        before = await self.db.leads.find_one_and_update(
+            {'_id': lead_id}, {'$set': changes, '$inc': {'version': 1}}, return_document=ReturnDocument.BEFORE)
+        updated = {**before, **changes, 'version': before.get('version', 1) + 1} if before else None
+        if before and 'status' in changes and before.get('status', 'New') != changes['status']:
+            await self._count_status(before.get('status', 'New'), -1)
+            await self._count_status(changes['status'], 1)
+        if updated and text_fields & changes.keys() and 'search' not in changes:
+            await self.db.leads.update_one({'_id': lead_id}, {'$set': {'search': with_search(dict(updated))['search']}})
+        return doc_to_lead(updated) if updated else None
+
+    async def delete_lead(self, lead_id):
+        deleted = await self.db.leads.find_one_and_delete({'_id': lead_id}, {'status': 1})
+        if deleted:
+            await self._count_status(deleted.get('status', 'New'), -1)
+        return deleted is not None
+
+
+if not MONGODB_URI:
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+store = MongoStore(MONGODB_URI, MONGODB_DB) if MONGODB_URI else SQLiteStore(DB_PATH, ASYNC_DB_POOL_SIZE)
+
+
+@app.before_serving
+async def startup():
+    await store.start()
+
+
+@app.after_serving
+async def shutdown():
+    await store.stop()
+
+
+def require_auth(f):
+    @wraps(f)
+    async def wrapper(*args, **kwargs):
+        auth = request.headers.get('Authorization', '')
+        if not auth.startswith('Bearer '):
+            return jsonify({'error': 'Unauthorized'}), 401
+        token = auth.split(' ', 1)[1]
+        try:
+            g.claims = verify_token(token)
+        except Exception:
+            return jsonify({'error': 'Unauthorized'}), 401
+        return await f(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/api/auth/login', methods=['POST'])
+async def login():
+    data = await request.get_json(silent=True) or {}
+    email = (data.get('email') or '').strip().lower()
+    password = data.get('password') or ''
+    stored = await store.get_password_hash(email)
+    try:
+        # Hashing runs in the shared verification pool, never on the event loop; submit() itself
+        # goes to a thread, as it starts the pool on first use and hashes inline without one
+        pending = asyncio.wrap_future(await asyncio.to_thread(passwords.submit, email, password, stored))
+        ok, new_hash = await asyncio.wait_for(pending, passwords.PASSWORD_VERIFY_TIMEOUT)
+    except (passwords.Overloaded, asyncio.TimeoutError):
+        return jsonify({'error': 'Login temporarily unavailable, retry shortly'}), 503, {'Retry-After': '1'}
+    if not ok:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    if new_hash:
+        await store.set_password_hash(email, stored, new_hash)
+    return jsonify({'token': token_for(email)})
+
+
+@app.route('/api/leads', methods=['GET'])
+@require_auth
+async def get_leads():
+    try:
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 5))
+    except Exception:
+        page, limit = 1, 5
+    if page < 1:
+        page = 1
+    if limit < 1:
+        limit = 5
+    limit = min(limit, MAX_PAGE_LIMIT)
+    count_mode = request.args.get('count', store.default_count_mode)
+    if count_mode not in COUNT_MODES:
+        count_mode = store.default_count_mode
+    cursor_arg = request.args.get('cursor')
+    after_id = request.args.get('after_id')
+    keyset = bool(cursor_arg or after_id)
+    if keyset:
+        try:
+            after_id = store.parse_id(decode_cursor(cursor_arg) if cursor_arg else after_id)
+        except Exception:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    else:
+        after_id = None
+    items, total = await store.list_leads(limit, 0 if keyset else (page - 1) * limit, after_id, count_mode)
+    has_more = len(items) > limit
+    items = items[:limit]
+    pages = (total + limit - 1) // limit if total is not None else None
+    next_cursor = encode_cursor(items[-1]['id']) if has_more else None
+    result = {'leads': items, 'limit': limit, 'total': total, 'pages': pages, 'next_cursor': next_cursor}
+    if not keyset:
+        result['page'] = page
+    return jsonify(result)
+
+
+@app.route('/api/leads', methods=['POST'])
+@require_auth
+async def add_lead():
+    lead = validate_lead(await request.get_json(silent=True) or {})
+    if lead is None:
+        return jsonify({'error': 'Bad request'}), 400
+    return jsonify(await store.add_lead(lead)), 201
+
+
+@app.route('/api/leads/<lead_id>', methods=['PUT'])
+@require_auth
+async def update_lead(lead_id):
+    try:
+        lead_id = store.parse_id(lead_id)
+    except Exception:
+        return jsonify({'error': 'Invalid lead ID'}), 400
+    changes = lead_changes(await request.get_json(silent=True) or {})
+    if changes is None:
+        return jsonify({'error': 'Bad request'}), 400
+    if changes:
+        updated = await store.update_lead(lead_id, changes)
+    else:
+        updated = await store.get_lead(lead_id)
+    if not updated:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(updated)
+
+
+@app.route('/api/leads/<lead_id>', methods=['DELETE'])
+@require_auth
+async def delete_lead(lead_id):
+    try:
+        lead_id = store.parse_id(lead_id)
+    except Exception:
+        return jsonify({'error': 'Invalid lead ID'}), 400
+    if not await store.delete_lead(lead_id):
+        return jsonify({'error': 'Not found'}), 404
+    return '', 204
@@ -0,0 +1,102 @@
+"""Helpers shared by the benchmark scripts; not a benchmark itself.
+
+Benchmarks measure the handlers, not admission control: BENCH_ENV turns the rate
+limiter off for apps imported in process (setup(), call it before importing one)
+and for servers started as subprocesses (server_env()). A variable already set in
+the environment wins.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+API_DIR = os.path.join(ROOT, 'api')
+BENCH_ENV = {'RATE_LIMIT_ENABLED': '0'}
+TEST_USER = {'email': 'test@example.com', 'password': 'password123'}
+
+
+def setup(**env):
+    # BENCH_ENV and env as defaults, the repo root (leads, app.py) and api/ (index) importable
+    for name, value in {**BENCH_ENV, **env}.items():
+        os.environ.setdefault(name, value)
+    for path in (ROOT, API_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def server_env(**env):
+    # Environment for an app server subprocess; env always applies
+    return {**BENCH_ENV, **os.environ, **env}
+
+
+def sqlite_app():
+    # api/index.py on a fresh SQLite file, schema applied
+    import index
+    index.repo.path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    index.init_db()
+    return index
+
+
+def auth_headers(email=TEST_USER['email']):
+    from leads.auth import token_for
+    return {'Authorization': 'Bearer ' + token_for(email)}
+
+
+def insert_leads(repo, rows):
+    # (name, email, phone, status) rows straight into the SQLite file, bypassing the API
+    conn = repo.connect()
+    conn.executemany('INSERT INTO leads (name, email, phone, status) VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+
+def timed(client, headers, url, repeat=5):
+    # Best of repeat GETs in ms; turn the page cache off or the repeats are cache hits
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        r = client.get(url, headers=headers)
+        elapsed = time.perf_counter() - start
+        assert r.status_code == 200, r.get_data(as_text=True)
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def request(port, path, token=None, body=None):
+    # (status, decoded JSON body or None) from a server on localhost
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = 'Bearer ' + token
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=data, headers=headers)
+    try:
+        with urllib.request.urlopen(req) as r:
+            return r.status, json.loads(r.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def login(port):
+    status, body = request(port, '/api/auth/login', body=TEST_USER)
+    if status != 200:
+        raise RuntimeError(f'login failed: {status}')
+    return body['token']
+
+
+def wait_ready(proc, port, path='/health', attempts=100):
+    # Until the server answers anything at all on path
+    for _ in range(attempts):
+        if proc.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=2).read()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
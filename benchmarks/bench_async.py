@@ -0,0 +1,87 @@
+"""Tail latency of GET /api/leads with many simultaneous clients: sync vs async build.
+
+Starts api/index.py under gunicorn (gthread) and app_async.py under uvicorn,
+both on the same SQLite file (DB_PATH), then opens N keep-alive connections that each
+issue R sequential requests. The page cache and the rate limiter are off on both
+servers, so both do the same database work per request.
+
+Usage: python benchmarks/bench_async.py [clients] [requests_per_client]
+"""
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+
+from _common import ROOT, login, server_env, wait_ready
+
+PORT = 8766
+
+
+async def client(token, requests, latencies, errors):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+    except OSError:
+        errors.append('connect')
+        return
+    request = (f'GET /api/leads?page=1&limit=5 HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+               f'Authorization: Bearer {token}\r\n\r\n').encode()
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            writer.write(request)
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode().partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if b' 200 ' not in status:
+                errors.append(status.decode().strip())
+    except (OSError, asyncio.IncompleteReadError) as e:
+        errors.append(type(e).__name__)
+    finally:
+        writer.close()
+
+
+async def drive(token, clients, requests):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(token, requests, latencies, errors) for _ in range(clients)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def run(label, cmd, env, clients, requests):
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(proc, PORT, '/api/leads')
+        latencies, errors, elapsed = asyncio.run(drive(login(PORT), clients, requests))
+    finally:
+        proc.terminate()
+        proc.wait()
+    ms = sorted(l * 1000 for l in latencies)
+    pct = lambda p: ms[min(len(ms) - 1, int(len(ms) * p / 100))] if ms else float('nan')
+    print(f'{label:<8} {len(ms) / elapsed:8.0f} req/s  p50 {statistics.median(ms) if ms else 0:8.1f}  '
+          f'p95 {pct(95):8.1f}  p99 {pct(99):8.1f}  max {ms[-1] if ms else 0:8.1f} ms  errors {len(errors)}')
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    env = server_env(PAGE_CACHE_SIZE='0')
+    print(f'{clients} clients x {requests} requests')
+    run('sync', ['gunicorn', '-w', '1', '--threads', '16', '--worker-connections', str(clients + 100),
+                 '--backlog', '4096', '-b', f'127.0.0.1:{PORT}', '--chdir', 'api', 'index:app'],
+        env, clients, requests)
+    run('async', ['uvicorn', 'app_async:app', '--host', '127.0.0.1', '--port', str(PORT),
+                  '--backlog', '4096', '--log-level', 'warning'],
+        env, clients, requests)
+
+
+if __name__ == '__main__':
+    main()
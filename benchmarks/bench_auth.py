@@ -0,0 +1,37 @@
+"""Per-request cost of require_auth with the JWT verification cache on and off.
+
+Usage: python benchmarks/bench_auth.py [iterations]
+"""
+import sys
+import time
+
+from _common import setup
+
+setup()
+import index  # noqa: E402
+from leads import auth  # noqa: E402
+from leads.routes import require_auth  # noqa: E402
+
+
+def run(iterations, cache_size):
+    auth.AUTH_CACHE_SIZE = cache_size
+    auth.clear_auth_cache()
+    protected = require_auth(lambda: 'ok')
+    headers = {'Authorization': 'Bearer ' + auth.token_for('test@example.com')}
+    with index.app.test_request_context('/api/leads', headers=headers):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            assert protected() == 'ok'
+        elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1e6, auth.auth_cache_info()
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    for label, size in (('cache off', 0), ('cache on', 1024)):
+        per_call, stats = run(iterations, size)
+        print(f'{label:<10} {per_call:8.2f} us/request  hits={stats["hits"]} misses={stats["misses"]}')
+
+
+if __name__ == '__main__':
+    main()
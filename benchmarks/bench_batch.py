@@ -0,0 +1,71 @@
+"""N individual PATCH/DELETE requests vs one POST /api/leads/batch.
+
+Moves N leads from New to In Progress, then deletes them, first one request per
+lead and then as a single batch, against a SQLite file via api/index.py (and the
+Mongo app too when MONGODB_URI points at a reachable mongod).
+
+Usage: python benchmarks/bench_batch.py [N ...]
+"""
+import os
+import sys
+import time
+
+from _common import auth_headers, setup, sqlite_app
+
+
+def seed(client, headers, n):
+    ids = []
+    for i in range(n):
+        r = client.post('/api/leads', json={'name': f'Lead {i}', 'email': f'lead{i}@example.com', 'phone': '1'},
+                        headers=headers)
+        assert r.status_code == 201, r.get_data(as_text=True)
+        ids.append(r.get_json()['id'])
+    return ids
+
+
+def individual(client, headers, ids):
+    start = time.perf_counter()
+    for lead_id in ids:
+        assert client.patch(f'/api/leads/{lead_id}', json={'status': 'In Progress'}, headers=headers).status_code == 200
+    updated = time.perf_counter() - start
+    start = time.perf_counter()
+    for lead_id in ids:
+        assert client.delete(f'/api/leads/{lead_id}', headers=headers).status_code == 204
+    return updated, time.perf_counter() - start
+
+
+def batched(client, headers, ids):
+    timings = []
+    for ops in ([{'op': 'update', 'id': lead_id, 'fields': {'status': 'In Progress'}} for lead_id in ids],
+                [{'op': 'delete', 'id': lead_id} for lead_id in ids]):
+        start = time.perf_counter()
+        r = client.post('/api/leads/batch', json={'operations': ops}, headers=headers)
+        timings.append(time.perf_counter() - start)
+        assert r.status_code == 200 and r.get_json()['applied'] == len(ids), r.get_data(as_text=True)
+    return timings
+
+
+def run(label, client, headers, sizes):
+    print(label)
+    for n in sizes:
+        one_update, one_delete = individual(client, headers, seed(client, headers, n))
+        batch_update, batch_delete = batched(client, headers, seed(client, headers, n))
+        print(f'  N={n:<5} update: {one_update * 1000:8.1f} ms individual  {batch_update * 1000:7.1f} ms batch'
+              f'  ({one_update / batch_update:5.1f}x)   delete: {one_delete * 1000:8.1f} ms  {batch_delete * 1000:7.1f} ms'
+              f'  ({one_delete / batch_delete:5.1f}x)')
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [10, 100, 1000]
+    setup(PASSWORD_WORKERS='0')
+    index = sqlite_app()
+    headers = auth_headers()
+    run('sqlite (api/index.py)', index.app.test_client(), headers, sizes)
+
+    if os.environ.get('MONGODB_URI'):
+        import app
+        run('mongo (app.py)', app.app.test_client(), headers, sizes)
+
+
+if __name__ == '__main__':
+    main()
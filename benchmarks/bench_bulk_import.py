@@ -0,0 +1,57 @@
+"""Throughput of POST /api/leads/bulk (NDJSON and CSV) against one POST /api/leads per lead.
+
+Usage: python benchmarks/bench_bulk_import.py [rows] [single_rows]
+"""
+import io
+import json
+import sys
+import time
+
+from _common import auth_headers, setup, sqlite_app
+
+setup()
+from leads.routes import BULK_CHUNK_SIZE  # noqa: E402
+
+
+def lead(i):
+    return {'name': f'Lead {i}', 'email': f'lead{i}@example.com', 'phone': f'{i:010d}', 'status': 'New'}
+
+
+def ndjson_body(rows):
+    return io.BytesIO(''.join(json.dumps(lead(i)) + '\n' for i in range(rows)).encode())
+
+
+def csv_body(rows):
+    lines = ['name,email,phone,status'] + [','.join(lead(i).values()) for i in range(rows)]
+    return io.BytesIO(('\n'.join(lines) + '\n').encode())
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    single_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    index = sqlite_app()
+    client = index.app.test_client()
+    headers = auth_headers()
+
+    start = time.perf_counter()
+    for i in range(single_rows):
+        r = client.post('/api/leads', json=lead(i), headers=headers)
+        assert r.status_code == 201
+    single = single_rows / (time.perf_counter() - start)
+
+    results = {}
+    for fmt, body, mimetype in (('ndjson', ndjson_body, 'application/x-ndjson'), ('csv', csv_body, 'text/csv')):
+        data = body(rows)
+        start = time.perf_counter()
+        r = client.post('/api/leads/bulk', data=data, headers=dict(headers, **{'Content-Type': mimetype}))
+        elapsed = time.perf_counter() - start
+        assert r.status_code == 200 and r.get_json()['inserted'] == rows, r.get_data(as_text=True)
+        results[fmt] = rows / elapsed
+
+    print(f'single POST /api/leads ({single_rows} rows): {single:10.0f} rows/s')
+    for fmt, rate in results.items():
+        print(f'bulk {fmt:<6} ({rows} rows, chunk {BULK_CHUNK_SIZE}): {rate:10.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Cold start of the serverless entry point (api/index.py), one fresh interpreter per run.
+
+Import: `python -X importtime -c "import index"`, reporting the cumulative time of
+`index` and its heaviest direct imports. Then, without -X importtime, the phases a
+first request pays for against a new SQLite file: import, first GET /login (served
+from memory, no database), first POST /api/auth/login (schema creation and one
+password check) and first GET /api/leads. Those run in the default configuration, so
+first login includes starting the spawn-based password pool; a second set of runs
+with PASSWORD_WORKERS=0 reports first login with the check inline, for comparison.
+
+Medians are checked against a budget, so CI can run this and fail on a regression:
+--import-budget-ms (COLD_START_IMPORT_BUDGET_MS, default 400) on the import and
+--page-budget-ms (COLD_START_PAGE_BUDGET_MS, default 500) on import plus the first
+page. Exits 1 when either is exceeded.
+
+Usage: python benchmarks/bench_cold_start.py [--runs 5] [--top 10] [--backend sqlite|memory]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from _common import API_DIR, server_env
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+# Runs in the child: phase timings in ms as one JSON line
+FIRST_REQUESTS = '''
+import json, time
+start = time.perf_counter()
+import index
+phases = {'import': time.perf_counter() - start}
+client = index.app.test_client()
+r = client.get('/login')
+assert r.status_code == 200, r.status_code
+phases['first page'] = time.perf_counter() - start
+r = client.post('/api/auth/login', json={'email': 'test@example.com', 'password': 'password123'})
+assert r.status_code == 200, r.get_data(as_text=True)
+phases['first login'] = time.perf_counter() - start
+r = client.get('/api/leads', headers={'Authorization': 'Bearer ' + r.get_json()['token']})
+assert r.status_code == 200, r.status_code
+phases['first list'] = time.perf_counter() - start
+print(json.dumps({name: seconds * 1000 for name, seconds in phases.items()}))
+'''
+
+
+def child_env(backend, workdir, run, **env):
+    env = server_env(DB_PATH=os.path.join(workdir, f'cold{run}.db'), **env)
+    if backend == 'memory':
+        env['LEADS_BACKEND'] = 'memory'
+    return env
+
+
+def import_times(env):
+    # ({module: cumulative ms} of index's direct imports, index's cumulative ms)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import index'], cwd=API_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+    children, total, pending = {}, None, []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1000, len(match.group(3)) // 2, match.group(4)
+        # Children are printed before their parent, one level deeper
+        pending.append((depth, name, cumulative))
+        if name == 'index' and depth == 0:
+            total = cumulative
+            children = {n: ms for d, n, ms in pending if d == 1}
+            break
+        if depth == 0:
+            pending = []
+    return children, total
+
+
+def first_requests(env):
+    proc = subprocess.run([sys.executable, '-c', FIRST_REQUESTS], cwd=API_DIR, env=env, capture_output=True,
+                          text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='heaviest direct imports to list')
+    parser.add_argument('--backend', choices=('sqlite', 'memory'), default='sqlite')
+    parser.add_argument('--import-budget-ms', type=float,
+                        default=float(os.environ.get('COLD_START_IMPORT_BUDGET_MS', '400')))
+    parser.add_argument('--page-budget-ms', type=float,
+                        default=float(os.environ.get('COLD_START_PAGE_BUDGET_MS', '500')))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='leads-cold-')
+    totals, modules, phases = [], {}, {}
+    try:
+        # One untimed run first so every timed run finds compiled bytecode, as a deployed bundle would
+        first_requests(child_env(args.backend, workdir, 'warm'))
+        for run in range(args.runs):
+            children, total = import_times(child_env(args.backend, workdir, f'i{run}'))
+            totals.append(total)
+            for name, ms in children.items():
+                modules.setdefault(name, []).append(ms)
+            for name, ms in first_requests(child_env(args.backend, workdir, run)).items():
+                phases.setdefault(name, []).append(ms)
+            inline = first_requests(child_env(args.backend, workdir, f'p{run}', PASSWORD_WORKERS='0'))
+            phases.setdefault('first login, PASSWORD_WORKERS=0', []).append(inline['first login'])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f'api/index.py cold start, {args.backend}, median of {args.runs} fresh interpreters')
+    print(f'\nimport index (-X importtime): {statistics.median(totals):7.1f} ms cumulative')
+    heaviest = sorted(modules.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+    for name, samples in heaviest:
+        print(f'  {name:<32} {statistics.median(samples):7.1f} ms')
+    print('\nfirst requests, ms since the import started')
+    for name, samples in phases.items():
+        print(f'  {name:<32} {statistics.median(samples):7.1f}   (min {min(samples):.1f}, max {max(samples):.1f})')
+
+    ok = True
+    for label, measured, budget in (('import', statistics.median(totals), args.import_budget_ms),
+                                    ('first page', statistics.median(phases['first page']), args.page_budget_ms)):
+        passed = measured <= budget
+        ok = ok and passed
+        print(f'{"PASS" if passed else "FAIL"}  {label} {measured:.1f} ms (budget {budget:.0f} ms)')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
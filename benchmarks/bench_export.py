@@ -0,0 +1,45 @@
+"""Peak Python memory and throughput of GET /api/leads/export as the table grows.
+
+Usage: python benchmarks/bench_export.py [max_rows]
+"""
+import sys
+import time
+import tracemalloc
+
+from _common import auth_headers, insert_leads, setup, sqlite_app
+
+setup()
+
+
+def seed(repo, rows):
+    insert_leads(repo, ((f'Lead {i}', f'lead{i}@example.com', f'{i:010d}', 'New') for i in range(rows)))
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    index = sqlite_app()
+    client = index.app.test_client()
+    headers = auth_headers()
+
+    print(f'{"rows":>10} {"format":>7} {"peak KiB":>10} {"rows/s":>10}')
+    rows = 0
+    target = 10000
+    while target <= max_rows:
+        seed(index.repo, target - rows)
+        rows = target
+        for fmt in ('ndjson', 'csv'):
+            tracemalloc.start()
+            start = time.perf_counter()
+            r = client.get(f'/api/leads/export?format={fmt}', headers=headers, buffered=False)
+            size = sum(len(chunk) for chunk in r.response)
+            r.close()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert size > 0
+            print(f'{rows:>10} {fmt:>7} {peak / 1024:>10.0f} {rows / elapsed:>10.0f}')
+        target *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""GET /api/leads latency during a login storm, with hashing inline vs in the verification pool.
+
+Starts api/index.py under gunicorn (1 worker, several threads) twice: once with
+PASSWORD_WORKERS=0 (scrypt on the request threads) and once with the process
+pool. Storm clients post wrong passwords (never cached) while reader clients
+time GET /api/leads.
+
+Usage: python benchmarks/bench_login.py [storm_clients] [readers] [seconds]
+"""
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from _common import API_DIR, login, request, server_env, wait_ready
+
+PORT = 8767
+THREADS = 8
+
+
+def run(workers, storm_clients, readers, seconds):
+    env = server_env(PASSWORD_WORKERS=str(workers), PAGE_CACHE_SIZE='0', SLOW_REQUEST_MS='0')
+    proc = subprocess.Popen(
+        ['gunicorn', '-w', '1', '--threads', str(THREADS), '-b', f'127.0.0.1:{PORT}', 'index:app'],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(proc, PORT)
+        token = login(PORT)
+        deadline = time.monotonic() + seconds
+        latencies, logins = [], []
+
+        def storm():
+            while time.monotonic() < deadline:
+                status, _ = request(PORT, '/api/auth/login', body={'email': 'test@example.com', 'password': 'wrong'})
+                logins.append(status)
+
+        def reader():
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                request(PORT, '/api/leads?page=1&limit=5', token)
+                latencies.append(time.perf_counter() - start)
+
+        clients = [threading.Thread(target=storm) for _ in range(storm_clients)]
+        clients += [threading.Thread(target=reader) for _ in range(readers)]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        return latencies, logins
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    storm_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    print(f'gunicorn 1 worker x {THREADS} threads, {storm_clients} login clients, {readers} readers, {seconds:.0f}s')
+    for label, workers in (('inline', 0), ('pool', 2)):
+        latencies, logins = run(workers, storm_clients, readers, seconds)
+        ms = sorted(l * 1000 for l in latencies)
+        p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+        print(f'{label:<7} leads {len(ms) / seconds:7.1f} req/s  p50 {statistics.median(ms):7.1f} ms  p99 {p99:7.1f} ms'
+              f'  logins 401={logins.count(401)} 503={logins.count(503)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Compare page/limit (OFFSET) and cursor (keyset) pagination at increasing depths.
+
+Usage: python benchmarks/bench_pagination.py [rows] [limit]
+"""
+import sys
+
+from _common import auth_headers, setup, sqlite_app, timed
+
+setup(PAGE_CACHE_SIZE='0')  # best of N repeats would otherwise time cache hits
+from leads.common import encode_cursor  # noqa: E402
+
+
+def seed(repo, rows):
+    conn = repo.connect()
+    conn.execute('DELETE FROM leads')
+    conn.executemany(
+        'INSERT INTO leads (name, email, phone, status) VALUES (?, ?, ?, ?)',
+        ((f'Lead {i}', f'lead{i}@example.com', f'{i:010d}', 'New') for i in range(rows)),
+    )
+    conn.commit()
+    top = conn.execute('SELECT MAX(id) FROM leads').fetchone()[0]
+    conn.close()
+    return top
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    index = sqlite_app()
+    top = seed(index.repo, rows)
+
+    client = index.app.test_client()
+    headers = auth_headers()
+
+    # Ids are contiguous, so the cursor for page p starts below id top - (p - 1) * limit + 1
+    max_page = rows // limit
+    print(f'{rows} leads, limit={limit}')
+    print(f'{"page":>10} {"offset ms":>12} {"cursor ms":>12}')
+    page = 1
+    while page <= max_page:
+        offset_ms = timed(client, headers, f'/api/leads?page={page}&limit={limit}')
+        after_id = top - (page - 1) * limit + 1
+        cursor = encode_cursor(after_id)
+        cursor_ms = timed(client, headers, f'/api/leads?cursor={cursor}&limit={limit}')
+        print(f'{page:>10} {offset_ms:>12.2f} {cursor_ms:>12.2f}')
+        page *= 10
+
+
+if __name__ == '__main__':
+    main()
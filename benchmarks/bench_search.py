@@ -0,0 +1,42 @@
+"""Latency of filtered GET /api/leads (status, email, q prefix search) on a large table.
+
+Usage: python benchmarks/bench_search.py [rows]
+"""
+import sys
+
+from _common import auth_headers, insert_leads, setup, sqlite_app, timed
+
+setup(PAGE_CACHE_SIZE='0')  # best of N repeats would otherwise time cache hits
+from leads.common import STATUSES  # noqa: E402
+
+FIRST_NAMES = ['Alice', 'Bob', 'Carol', 'Dave', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy']
+
+
+def seed(repo, rows):
+    insert_leads(repo, ((f'{FIRST_NAMES[i % 10]} {i}', f'lead{i}@example.com', f'{i:010d}', STATUSES[i % 3])
+                        for i in range(rows)))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    index = sqlite_app()
+    seed(index.repo, rows)
+    client = index.app.test_client()
+    headers = auth_headers()
+
+    queries = [
+        ('unfiltered', ''),
+        ('status', 'status=Converted'),
+        ('status, count=none', 'status=Converted&count=none'),
+        ('email', f'email=lead{rows // 2}@example.com'),
+        ('q rare prefix', f'q={rows // 2}'),
+        ('q common prefix', 'q=gra&count=none'),
+        ('q two terms', f'q=grace+lead{rows // 3}'),
+    ]
+    print(f'{rows} leads')
+    for label, qs in queries:
+        print(f'{label:<22} {timed(client, headers, "/api/leads?limit=20&" + qs):8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Serialisation cost of a GET /api/leads page at limit 5, 100 and 1000.
+
+Compares the previous path (a dict per lead, then Flask's stdlib jsonify), the
+row template used when orjson is missing, and orjson, all on the same rows from
+the in-memory repository. Then times the whole GET through the test client with
+the page cache off, using whichever provider JSON_PROVIDER selects.
+
+Usage: python benchmarks/bench_serialize.py [iterations]
+"""
+import statistics
+import sys
+import time
+
+from _common import auth_headers, setup
+
+setup(PAGE_CACHE_SIZE='0')
+from flask import Flask, jsonify  # noqa: E402
+
+from leads import serialize  # noqa: E402
+from leads.common import lead_from_row  # noqa: E402
+from leads.memory import InMemoryRepository  # noqa: E402
+from leads.routes import leads_blueprint  # noqa: E402
+
+LIMITS = (5, 100, 1000)
+
+
+def best_of(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repo = InMemoryRepository(seed=False)
+    repo.insert_leads([{'name': f'Lead {i}', 'email': f'lead{i}@example.com', 'phone': f'{i:010d}', 'status': 'New'}
+                       for i in range(max(LIMITS) + 1)])
+    plain = Flask('plain')  # default stdlib provider, as before
+    use_orjson = serialize.USE_ORJSON
+
+    print(f'median of {iterations} runs, microseconds per page')
+    print(f'{"limit":>6} {"dicts+jsonify":>14} {"rows stdlib":>12} {"rows orjson":>12}')
+    for limit in LIMITS:
+        rows, total, has_more = repo.list_leads({}, 'exact', limit)
+        meta = {'limit': limit, 'total': total, 'pages': (total + limit - 1) // limit, 'next_cursor': None, 'page': 1}
+
+        def before():
+            with plain.app_context():
+                jsonify(dict(meta, leads=[lead_from_row(r) for r in rows])).get_data()
+
+        serialize.USE_ORJSON = False
+        stdlib = best_of(lambda: serialize.page_body(rows, meta), iterations)
+        fast = None
+        if serialize.orjson is not None:
+            serialize.USE_ORJSON = True
+            fast = best_of(lambda: serialize.page_body(rows, meta), iterations)
+        serialize.USE_ORJSON = use_orjson
+        fast = f'{fast:12.1f}' if fast is not None else f'{"n/a":>12}'
+        print(f'{limit:>6} {best_of(before, iterations):14.1f} {stdlib:12.1f} {fast}')
+
+    app = Flask('bench')
+    app.register_blueprint(leads_blueprint(repo))
+    client = app.test_client()
+    headers = auth_headers()
+    print(f'\nGET /api/leads end to end ({"orjson" if use_orjson else "stdlib"}), microseconds')
+    for limit in LIMITS:
+        url = f'/api/leads?limit={limit}&count=none'
+        assert client.get(url, headers=headers).status_code == 200
+        print(f'{limit:>6} {best_of(lambda: client.get(url, headers=headers), iterations):12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Latency of the lead write path (POST, full PUT, status-only PUT, DELETE).
+
+Runs against the in-memory repository (the floor: routing, validation and
+serialisation only), a SQLite file via api/index.py, and against the Mongo app
+(app.py) as well when MONGODB_URI points at a reachable mongod, e.g.
+MONGODB_URI=mongodb://127.0.0.1:27017 MONGODB_DB=hashai_bench
+
+Usage: python benchmarks/bench_write_path.py [iterations]
+"""
+import os
+import statistics
+import sys
+import time
+
+from _common import auth_headers, setup, sqlite_app
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(client, headers, iterations):
+    timings = {'POST': [], 'PUT full': [], 'PUT status': [], 'DELETE': []}
+    for i in range(iterations):
+        lead = {'name': f'Lead {i}', 'email': f'lead{i}@example.com', 'phone': f'{i:010d}'}
+        start = time.perf_counter()
+        r = client.post('/api/leads', json=lead, headers=headers)
+        timings['POST'].append(time.perf_counter() - start)
+        assert r.status_code == 201, r.get_data(as_text=True)
+        lead_id = r.get_json()['id']
+
+        start = time.perf_counter()
+        r = client.put(f'/api/leads/{lead_id}', json=dict(lead, status='In Progress'), headers=headers)
+        timings['PUT full'].append(time.perf_counter() - start)
+        assert r.status_code == 200, r.get_data(as_text=True)
+
+        start = time.perf_counter()
+        r = client.put(f'/api/leads/{lead_id}', json={'status': 'Converted'}, headers=headers)
+        timings['PUT status'].append(time.perf_counter() - start)
+        assert r.status_code == 200, r.get_data(as_text=True)
+
+        start = time.perf_counter()
+        r = client.delete(f'/api/leads/{lead_id}', headers=headers)
+        timings['DELETE'].append(time.perf_counter() - start)
+        assert r.status_code == 204, r.get_data(as_text=True)
+    return timings
+
+
+def report(backend, timings):
+    print(backend)
+    for op, samples in timings.items():
+        ms = [s * 1000 for s in samples]
+        print(f'  {op:<11} p50 {statistics.median(ms):7.3f} ms  p95 {percentile(ms, 95):7.3f} ms')
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    setup()
+    index = sqlite_app()
+    headers = auth_headers()
+
+    from flask import Flask
+    from leads.memory import InMemoryRepository
+    from leads.routes import leads_blueprint
+    memory = Flask(__name__)
+    memory.register_blueprint(leads_blueprint(InMemoryRepository()))
+    report('memory (InMemoryRepository)', measure(memory.test_client(), headers, iterations))
+
+    report('sqlite (api/index.py)', measure(index.app.test_client(), headers, iterations))
+
+    if os.environ.get('MONGODB_URI'):
+        import app
+        headers = auth_headers()
+        report('mongo (app.py)', measure(app.app.test_client(), headers, iterations))
+
+
+if __name__ == '__main__':
+    main()
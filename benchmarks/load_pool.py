@@ -0,0 +1,58 @@
+"""Requests/sec for GET /api/leads under gunicorn, with and without the SQLite pool.
+
+Starts api/index.py under gunicorn (1 worker, several threads) once with
+DB_POOL_SIZE=0 (a fresh connection per request) and once with the pool on.
+
+Usage: python benchmarks/load_pool.py [threads] [clients] [seconds]
+"""
+import subprocess
+import sys
+import threading
+import time
+
+from _common import API_DIR, login, request, server_env, wait_ready
+
+PORT = 8765
+
+
+def run(pool_size, threads, clients, seconds):
+    env = server_env(DB_POOL_SIZE=str(pool_size))
+    proc = subprocess.Popen(
+        ['gunicorn', '-w', '1', '--threads', str(threads), '-b', f'127.0.0.1:{PORT}', 'index:app'],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(proc, PORT)
+        token = login(PORT)
+        counts = [0] * clients
+        deadline = time.monotonic() + seconds
+
+        def client(i):
+            while time.monotonic() < deadline:
+                request(PORT, '/api/leads?page=1&limit=5', token)
+                counts[i] += 1
+
+        workers = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return sum(counts) / seconds
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    before = run(0, threads, clients, seconds)
+    after = run(threads, threads, clients, seconds)
+    print(f'gunicorn 1 worker x {threads} threads, {clients} clients, {seconds:.0f}s')
+    print(f'no pool:   {before:8.1f} req/s')
+    print(f'pool:      {after:8.1f} req/s')
+
+
+if __name__ == '__main__':
+    main()
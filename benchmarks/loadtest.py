@@ -0,0 +1,469 @@
+"""Mixed-workload load test of the lead API with a JSON report for comparing commits.
+
+Seeds SQLite (the api/index.py schema) or MongoDB (app.py) with synthetic leads,
+then replays a weighted mix of operations from concurrent clients against the
+real WSGI app, either in process (Flask test client) or under gunicorn over
+HTTP keep-alive connections. Reports throughput and p50/p95/p99/max latency per
+operation and overall.
+
+Operations (weights via --mix):
+  list    GET /api/leads first page
+  deep    GET /api/leads at a random offset page (count=none)
+  keyset  GET /api/leads?after_id=<random id>
+  login   POST /api/auth/login (one of --users seeded users)
+  create  POST /api/leads
+  update  PATCH /api/leads/<random id>
+  delete  DELETE /api/leads/<random id>
+
+SQLite seeds a template file once per lead count (kept in --cache-dir) and each
+run works on a fresh copy, so runs start from identical data. Mongo seeds the
+database loadtest_<leads> once (--reseed to rebuild); runs write to it. Use
+MONGODB_URI, or --mongod to start a throwaway local mongod.
+
+Examples:
+  python benchmarks/loadtest.py --leads 10000 --mode inprocess -o before.json
+  python benchmarks/loadtest.py --leads 1000000 --mode gunicorn --threads 8 -o after.json --compare before.json
+  python benchmarks/loadtest.py --backend mongo --mongod --leads 1000000
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from _common import API_DIR, ROOT, auth_headers, server_env, setup, wait_ready
+
+DEFAULT_MIX = 'list=40,deep=10,keyset=10,login=5,create=15,update=15,delete=5'
+PAGE_LIMIT = 20
+USER_PASSWORD = 'loadtest-password'
+SEED_CHUNK = 50000
+ID_SAMPLE = 20000
+
+setup()  # before any app import
+from leads.common import STATUSES  # noqa: E402
+
+
+def synthetic_lead(i):
+    return {'name': f'Lead {i}', 'email': f'lead{i}@example.com', 'phone': f'{i:010d}',
+            'status': STATUSES[i % len(STATUSES)]}
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        op, _, weight = part.partition('=')
+        if op not in OPERATIONS:
+            raise SystemExit(f'unknown operation {op!r}; choose from {", ".join(OPERATIONS)}')
+        mix[op] = float(weight)
+    return mix
+
+
+def progress(done, total, start):
+    rate = done / max(time.perf_counter() - start, 1e-9)
+    print(f'\r  seeded {done:,}/{total:,} leads ({rate:,.0f}/s)', end='', file=sys.stderr, flush=True)
+
+
+# --- seeding ---------------------------------------------------------------
+
+def seed_users(password_hash, count):
+    return [(f'load{i}@example.com', password_hash) for i in range(count)]
+
+
+def seed_sqlite(leads, users, cache_dir):
+    # Template file per lead count, built once through the repository's own insert path
+    from leads.passwords import hash_password
+    from leads.sqlite import SQLiteRepository
+    template = os.path.join(cache_dir, f'leads-loadtest-{leads}.db')
+    if os.path.exists(template):
+        return template
+    building = template + '.building'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(building + suffix):
+            os.remove(building + suffix)
+    repo = SQLiteRepository(building, pool_size=1)
+    repo.init_schema()
+    with repo.connection() as conn:
+        conn.execute('DELETE FROM leads')  # drop the sample leads so ids run 1..leads
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'leads'")
+        conn.execute("UPDATE counters SET value = 0 WHERE name = 'leads'")
+        conn.executemany('INSERT OR IGNORE INTO users (email, password) VALUES (?, ?)',
+                         seed_users(hash_password(USER_PASSWORD), users))
+        conn.commit()
+    start = time.perf_counter()
+    for first in range(0, leads, SEED_CHUNK):
+        repo.insert_leads([synthetic_lead(i) for i in range(first, min(leads, first + SEED_CHUNK))])
+        progress(min(leads, first + SEED_CHUNK), leads, start)
+    print(file=sys.stderr)
+    with repo.connection() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.execute('ANALYZE')
+        conn.commit()
+    repo.close()
+    os.replace(building, template)
+    return template
+
+
+def sqlite_ids(path):
+    import sqlite3
+    conn = sqlite3.connect(path)
+    try:
+        high = conn.execute('SELECT MAX(id) FROM leads').fetchone()[0] or 0
+    finally:
+        conn.close()
+    rng = random.Random(1)
+    return [str(rng.randint(1, high)) for _ in range(min(ID_SAMPLE, high))]
+
+
+def seed_mongo(uri, db_name, leads, users, reseed):
+    from pymongo import MongoClient
+    from leads.common import lead_document
+    from leads.passwords import hash_password
+    db = MongoClient(uri)[db_name]
+    if not reseed and db.leads.estimated_document_count() >= leads and db.users.count_documents({}) > users:
+        return
+    db.leads.drop()
+    db.users.drop()
+    db.users.insert_many([{'email': email, 'password': password}
+                          for email, password in seed_users(hash_password(USER_PASSWORD), users)])
+    start = time.perf_counter()
+    for first in range(0, leads, SEED_CHUNK):
+        db.leads.insert_many([lead_document(synthetic_lead(i)) for i in range(first, min(leads, first + SEED_CHUNK))],
+                             ordered=False)
+        progress(min(leads, first + SEED_CHUNK), leads, start)
+    print(file=sys.stderr)
+
+
+def mongo_ids(uri, db_name):
+    from pymongo import MongoClient
+    db = MongoClient(uri)[db_name]
+    return [str(doc['_id']) for doc in db.leads.aggregate([{'$sample': {'size': ID_SAMPLE}}, {'$project': {'_id': 1}}])]
+
+
+def start_mongod(workdir, port):
+    mongod = os.environ.get('MONGOD', 'mongod')
+    path = os.path.join(workdir, 'mongod')
+    os.makedirs(path)
+    proc = subprocess.Popen([mongod, '--port', str(port), '--bind_ip', '127.0.0.1', '--dbpath', path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    from pymongo import MongoClient
+    MongoClient('127.0.0.1', port, serverSelectionTimeoutMS=30000).admin.command('ping')
+    return proc
+
+
+# --- clients -----------------------------------------------------------------
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        r = self.client.open(path, method=method, json=body, headers=headers or {})
+        data = r.get_data()
+        return r.status_code, data
+
+
+class HTTPClient:
+    # One keep-alive connection per client thread
+    def __init__(self, port):
+        self.port = port
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.conn.request(method, path, body=data, headers=headers)
+            r = self.conn.getresponse()
+            return r.status, r.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            return 599, b''
+
+
+# --- workload ---------------------------------------------------------------
+
+class Workload:
+    def __init__(self, ids, leads, users):
+        self.ids = ids
+        self.leads = leads
+        self.users = users
+        self.lock = threading.Lock()
+        self.created = 0
+
+    def random_id(self, rng):
+        with self.lock:
+            return rng.choice(self.ids) if self.ids else '1'
+
+    def take_id(self, rng):
+        with self.lock:
+            if not self.ids:
+                return '1'
+            pos = rng.randrange(len(self.ids))
+            self.ids[pos], self.ids[-1] = self.ids[-1], self.ids[pos]
+            return self.ids.pop()
+
+
+def op_list(client, ctx, rng):
+    return client.request('GET', f'/api/leads?page=1&limit={PAGE_LIMIT}', headers=ctx['auth'])
+
+
+def op_deep(client, ctx, rng):
+    page = rng.randint(1, max(1, ctx['workload'].leads // PAGE_LIMIT))
+    return client.request('GET', f'/api/leads?page={page}&limit={PAGE_LIMIT}&count=none', headers=ctx['auth'])
+
+
+def op_keyset(client, ctx, rng):
+    after = ctx['workload'].random_id(rng)
+    return client.request('GET', f'/api/leads?after_id={after}&limit={PAGE_LIMIT}&count=none', headers=ctx['auth'])
+
+
+def op_login(client, ctx, rng):
+    email = f'load{rng.randrange(ctx["workload"].users)}@example.com'
+    return client.request('POST', '/api/auth/login', body={'email': email, 'password': USER_PASSWORD})
+
+
+def op_create(client, ctx, rng):
+    i = rng.randrange(10 ** 9)
+    status, data = client.request('POST', '/api/leads', body=synthetic_lead(i), headers=ctx['auth'])
+    if status == 201:
+        with ctx['workload'].lock:
+            ctx['workload'].ids.append(json.loads(data)['id'])
+    return status, data
+
+
+def op_update(client, ctx, rng):
+    lead_id = ctx['workload'].random_id(rng)
+    return client.request('PATCH', f'/api/leads/{lead_id}', body={'status': rng.choice(STATUSES)}, headers=ctx['auth'])
+
+
+def op_delete(client, ctx, rng):
+    lead_id = ctx['workload'].take_id(rng)
+    return client.request('DELETE', f'/api/leads/{lead_id}', headers=ctx['auth'])
+
+
+OPERATIONS = {'list': op_list, 'deep': op_deep, 'keyset': op_keyset, 'login': op_login,
+              'create': op_create, 'update': op_update, 'delete': op_delete}
+
+
+def drive(make_client, ctx, mix, clients, seconds, warmup, seed):
+    ops, weights = zip(*mix.items())
+    samples = {op: [] for op in ops}
+    statuses = {op: {} for op in ops}
+    start_line = threading.Barrier(clients + 1)
+    window = {}
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = make_client()
+        local = {op: [] for op in ops}
+        local_status = {op: {} for op in ops}
+        start_line.wait()
+        while True:
+            now = time.perf_counter()
+            if now >= window['end']:
+                break
+            op = rng.choices(ops, weights)[0]
+            began = time.perf_counter()
+            status, _ = OPERATIONS[op](client, ctx, rng)
+            elapsed = time.perf_counter() - began
+            if began >= window['measure']:
+                local[op].append(elapsed)
+                local_status[op][status] = local_status[op].get(status, 0) + 1
+        with ctx['workload'].lock:
+            for op in ops:
+                samples[op].extend(local[op])
+                for status, n in local_status[op].items():
+                    statuses[op][status] = statuses[op].get(status, 0) + n
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    now = time.perf_counter()
+    window['measure'] = now + warmup
+    window['end'] = now + warmup + seconds
+    start_line.wait()
+    for t in threads:
+        t.join()
+    return samples, statuses
+
+
+def summarise(samples, statuses, seconds):
+    def stats(values, codes):
+        ordered = sorted(values)
+        ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+        errors = sum(n for code, n in codes.items() if code >= 500)
+        return {'count': len(ordered), 'rps': round(len(ordered) / seconds, 1),
+                'p50_ms': ms(percentile(ordered, 50)), 'p95_ms': ms(percentile(ordered, 95)),
+                'p99_ms': ms(percentile(ordered, 99)), 'max_ms': ms(ordered[-1] if ordered else None),
+                'errors': errors, 'status': {str(code): n for code, n in sorted(codes.items())}}
+
+    ops = {op: stats(samples[op], statuses[op]) for op in samples}
+    everything = [v for values in samples.values() for v in values]
+    codes = {}
+    for op_codes in statuses.values():
+        for code, n in op_codes.items():
+            codes[code] = codes.get(code, 0) + n
+    return ops, stats(everything, codes)
+
+
+def git_revision():
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                             text=True).strip())
+        return rev, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f'\nvs {baseline_path} ({baseline.get("commit")}):', file=sys.stderr)
+    rows = [('overall', report['overall'], baseline.get('overall', {}))]
+    rows += [(op, stats, baseline.get('ops', {}).get(op, {})) for op, stats in report['ops'].items()]
+    for name, now, before in rows:
+        cells = []
+        for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            if now.get(key) is None or not before.get(key):
+                cells.append(f'{key} n/a')
+                continue
+            change = (now[key] - before[key]) / before[key] * 100
+            cells.append(f'{key} {before[key]:g} -> {now[key]:g} ({change:+.1f}%)')
+        print(f'  {name:<8} ' + '  '.join(cells), file=sys.stderr)
+
+
+# --- targets ------------------------------------------------------------------
+
+def start_gunicorn(args, env):
+    if args.backend == 'sqlite':
+        cwd, target = API_DIR, 'index:app'
+    else:
+        cwd, target = ROOT, 'app:app'
+    proc = subprocess.Popen(
+        ['gunicorn', '-w', str(args.workers), '-k', 'gthread', '--threads', str(args.threads),
+         '--keep-alive', '30', '-b', f'127.0.0.1:{args.port}', target],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    wait_ready(proc, args.port, attempts=300)
+    return proc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--backend', choices=('sqlite', 'mongo'), default='sqlite')
+    parser.add_argument('--leads', type=int, default=10000, help='seeded leads: e.g. 10000, 1000000, 10000000')
+    parser.add_argument('--users', type=int, default=100, help='seeded login users')
+    parser.add_argument('--mode', choices=('inprocess', 'gunicorn'), default='inprocess')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=8790)
+    parser.add_argument('--no-page-cache', action='store_true', help='PAGE_CACHE_SIZE=0')
+    parser.add_argument('--cache-dir', default=os.path.join(tempfile.gettempdir(), 'leads-loadtest'),
+                        help='where seeded SQLite templates are kept between runs')
+    parser.add_argument('--mongod', action='store_true', help='start a throwaway local mongod')
+    parser.add_argument('--reseed', action='store_true', help='rebuild the seeded data')
+    parser.add_argument('-o', '--output', help='write the JSON report here (default: stdout)')
+    parser.add_argument('--compare', help='baseline JSON report to diff against')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    if args.no_page_cache:
+        os.environ['PAGE_CACHE_SIZE'] = '0'
+
+    workdir = tempfile.mkdtemp(prefix='leads-loadtest-')
+    os.makedirs(args.cache_dir, exist_ok=True)
+    mongod = gunicorn = None
+    try:
+        if args.backend == 'sqlite':
+            # Before leads.sqlite is imported: the apps read DB_PATH once
+            os.environ['DB_PATH'] = os.path.join(workdir, 'run.db')
+            if args.reseed:
+                template = os.path.join(args.cache_dir, f'leads-loadtest-{args.leads}.db')
+                if os.path.exists(template):
+                    os.remove(template)
+            print(f'seeding sqlite with {args.leads:,} leads', file=sys.stderr)
+            template = seed_sqlite(args.leads, args.users, args.cache_dir)
+            shutil.copyfile(template, os.environ['DB_PATH'])
+            ids = sqlite_ids(os.environ['DB_PATH'])
+        else:
+            if args.mongod:
+                mongod = start_mongod(workdir, args.port + 1)
+                os.environ['MONGODB_URI'] = f'mongodb://127.0.0.1:{args.port + 1}'
+            if not os.environ.get('MONGODB_URI'):
+                raise SystemExit('set MONGODB_URI or pass --mongod')
+            os.environ['MONGODB_DB'] = f'loadtest_{args.leads}'
+            print(f'seeding mongo with {args.leads:,} leads', file=sys.stderr)
+            seed_mongo(os.environ['MONGODB_URI'], os.environ['MONGODB_DB'], args.leads, args.users, args.reseed)
+            ids = mongo_ids(os.environ['MONGODB_URI'], os.environ['MONGODB_DB'])
+
+        ctx = {'auth': auth_headers('load0@example.com'),
+               'workload': Workload(ids, args.leads, args.users)}
+        if args.mode == 'inprocess':
+            if args.backend == 'sqlite':
+                import index
+                app = index.app
+            else:
+                import app as mongo_app
+                app = mongo_app.app
+            make_client = lambda: InProcessClient(app)  # noqa: E731
+        else:
+            gunicorn = start_gunicorn(args, server_env())
+            make_client = lambda: HTTPClient(args.port)  # noqa: E731
+
+        print(f'{args.mode}: {args.clients} clients, {args.warmup:g}s warmup + {args.seconds:g}s, mix {args.mix}',
+              file=sys.stderr)
+        samples, statuses = drive(make_client, ctx, mix, args.clients, args.seconds, args.warmup, args.seed)
+        ops, overall = summarise(samples, statuses, args.seconds)
+        commit, dirty = git_revision()
+        report = {
+            'commit': commit, 'dirty': dirty, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+            'backend': args.backend, 'mode': args.mode, 'leads': args.leads, 'users': args.users,
+            'clients': args.clients, 'seconds': args.seconds, 'warmup': args.warmup, 'mix': mix,
+            'workers': args.workers if args.mode == 'gunicorn' else None,
+            'threads': args.threads if args.mode == 'gunicorn' else None,
+            'page_cache': os.environ.get('PAGE_CACHE_SIZE', 'default'),
+            'throughput_rps': overall['rps'], 'overall': overall, 'ops': ops,
+        }
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        else:
+            print(text)
+        print(f'throughput {overall["rps"]:,.1f} req/s  p50 {overall["p50_ms"]} ms  p95 {overall["p95_ms"]} ms'
+              f'  p99 {overall["p99_ms"]} ms  5xx {overall["errors"]}', file=sys.stderr)
+        if args.compare:
+            compare(report, args.compare)
+    finally:
+        if gunicorn is not None:
+            gunicorn.terminate()
+            gunicorn.wait()
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Runs the Mongo app (app.py) against a throwaway local replica set and checks the
+read/write routing: list and count queries reach the secondaries, a client reads
+its own writes straight away, writes carry the configured write concern, and the
+change feed works. Also reports how often an immediate re-read misses a fresh
+write when read-your-writes sessions are turned off.
+
+Needs mongod on PATH (or MONGOD=/path/to/mongod). Members run from a temp dir on
+ports 27117.. and are shut down at the end.
+
+Usage: python benchmarks/mongo_replica_set.py [members] [writes]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import auth_headers, setup
+
+BASE_PORT = 27117
+REPLICA_SET = 'rs_leads'
+
+
+def start_members(count, workdir):
+    mongod = os.environ.get('MONGOD', 'mongod')
+    procs = []
+    for i in range(count):
+        path = os.path.join(workdir, f'member{i}')
+        os.makedirs(path)
+        procs.append(subprocess.Popen(
+            [mongod, '--replSet', REPLICA_SET, '--port', str(BASE_PORT + i), '--bind_ip', '127.0.0.1',
+             '--dbpath', path, '--oplogSize', '64'],
+            stdout=open(os.path.join(path, 'mongod.log'), 'w'), stderr=subprocess.STDOUT,
+        ))
+    return procs
+
+
+def initiate(count):
+    from pymongo import MongoClient
+    seed = MongoClient('127.0.0.1', BASE_PORT, directConnection=True, serverSelectionTimeoutMS=30000)
+    members = [{'_id': i, 'host': f'127.0.0.1:{BASE_PORT + i}', 'priority': 2 if i == 0 else 1} for i in range(count)]
+    seed.admin.command('replSetInitiate', {'_id': REPLICA_SET, 'members': members})
+    for _ in range(300):
+        status = seed.admin.command('replSetGetStatus')
+        states = [m['stateStr'] for m in status['members']]
+        if states[0] == 'PRIMARY' and all(state in ('PRIMARY', 'SECONDARY') for state in states):
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f'replica set did not come up: {states}')
+
+
+def secondary_reads(count):
+    # find and aggregate (count_documents) commands served by the secondaries so far
+    from pymongo import MongoClient
+    total = 0
+    for i in range(1, count):
+        member = MongoClient('127.0.0.1', BASE_PORT + i, directConnection=True)
+        commands = member.admin.command('serverStatus')['metrics']['commands']
+        total += commands['find']['total'] + commands['aggregate']['total']
+        member.close()
+    return total
+
+
+def check(label, ok, detail=''):
+    print(f'{"PASS" if ok else "FAIL"}  {label}{"  " + detail if detail else ""}')
+    return ok
+
+
+def run_checks(count, writes):
+    hosts = ','.join(f'127.0.0.1:{BASE_PORT + i}' for i in range(count))
+    os.environ['MONGODB_URI'] = f'mongodb://{hosts}/?replicaSet={REPLICA_SET}'
+    os.environ['MONGODB_DB'] = 'hashai_rs'
+    setup(MONGO_WRITE_CONCERN='majority', PASSWORD_WORKERS='0', PAGE_CACHE_SIZE='0', CHANGES_STREAM_ENABLED='1',
+          CHANGES_STREAM_SECONDS='1')
+    import app
+    client = app.app.test_client()
+    headers = auth_headers()
+    results = []
+
+    wc = app.repo.db.write_concern.document
+    results.append(check('write concern', str(wc.get('w')) == os.environ['MONGO_WRITE_CONCERN'], str(wc)))
+
+    before = secondary_reads(count)
+    for _ in range(20):
+        client.get('/api/leads?limit=5&count=exact', headers=headers)
+    after = secondary_reads(count)
+    results.append(check('list/count reads reach secondaries', after - before >= 20, f'{after - before} operations'))
+
+    def immediate_rereads(label):
+        missed = 0
+        start = time.perf_counter()
+        for i in range(writes):
+            email = f'ryw-{label}-{i}-{time.time_ns()}@example.com'
+            r = client.post('/api/leads', json={'name': 'RYW', 'email': email, 'phone': '1'}, headers=headers)
+            assert r.status_code == 201, r.get_data(as_text=True)
+            page = client.get(f'/api/leads?email={email}&count=exact', headers=headers).get_json()
+            missed += page['total'] != 1
+        return missed, (time.perf_counter() - start) / writes * 1000
+
+    missed, ms = immediate_rereads('session')
+    results.append(check('read-your-writes with causal sessions', missed == 0,
+                         f'{missed}/{writes} stale, {ms:.1f} ms per write+read'))
+    causal_ttl, app.repo.causal_ttl = app.repo.causal_ttl, 0
+    missed, ms = immediate_rereads('plain')
+    app.repo.causal_ttl = causal_ttl
+    print(f'info  without sessions: {missed}/{writes} immediate re-reads were stale, {ms:.1f} ms per write+read')
+
+    r = client.get('/api/leads/changes?since=', headers=headers)
+    results.append(check('change feed available', r.status_code == 200, r.get_data(as_text=True).split('\n')[2]))
+    return all(results)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    workdir = tempfile.mkdtemp(prefix='leads-rs-')
+    procs = start_members(count, workdir)
+    try:
+        initiate(count)
+        ok = run_checks(count, writes)
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
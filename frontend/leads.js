@@ -11,24 +11,123 @@ let page = 1
 let limit = 5
 let pages = 1
 let adding = false
+let lastEventId = null
+let pageEtag = null
+const POLL_MS = 10000  // re-read the current page this often when the change feed is unavailable
+const shown = new Map()
 
 logout.onclick = () => { localStorage.removeItem('token'); location.href = '/login' }
 
-async function load() {
-  tbody.innerHTML = ''
-  const r = await fetch(`/api/leads?page=${page}&limit=${limit}`, { headers: { 'Authorization': 'Bearer ' + token } })
+async function load(poll = false) {
+  // poll: conditional re-read, left alone on 304 (page unchanged) or a transient error
+  const headers = { 'Authorization': 'Bearer ' + token }
+  if (poll && pageEtag) headers['If-None-Match'] = pageEtag
+  const r = await fetch(`/api/leads?page=${page}&limit=${limit}`, { headers, cache: 'no-store' })
+  if (poll && r.status !== 200 && r.status !== 401) return
   if (!r.ok) { location.href = '/login'; return }
+  pageEtag = r.headers.get('ETag')
   const data = await r.json()
+  tbody.innerHTML = ''
   pages = data.pages || 1
   pageLbl.textContent = `Page ${data.page} / ${pages}`
   prevBtn.disabled = data.page <= 1
   nextBtn.disabled = data.page >= pages
-  data.leads.forEach(l => {
-    const tr = document.createElement('tr')
-    tr.setAttribute('data-id', l.id)
-    tr.innerHTML = `<td class="px-3 py-2">${l.name}</td><td class="px-3 py-2">${l.email}</td><td class="px-3 py-2">${l.phone}</td><td class="px-3 py-2">${l.status}</td><td class="px-3 py-2"><button data-id="${l.id}" class="edit px-2 py-1 bg-yellow-500 text-white rounded">Edit</button> <button data-id="${l.id}" class="del px-2 py-1 bg-red-600 text-white rounded">Delete</button></td>`
-    tbody.appendChild(tr)
-  })
+  shown.clear()
+  data.leads.forEach(l => tbody.appendChild(renderRow(l)))
+}
+
+function renderRow(l) {
+  shown.set(l.id, l)
+  const tr = document.createElement('tr')
+  tr.setAttribute('data-id', l.id)
+  tr.setAttribute('data-version', l.version)
+  tr.innerHTML = `<td class="px-3 py-2">${l.name}</td><td class="px-3 py-2">${l.email}</td><td class="px-3 py-2">${l.phone}</td><td class="px-3 py-2">${l.status}</td><td class="px-3 py-2"><button data-id="${l.id}" class="edit px-2 py-1 bg-yellow-500 text-white rounded">Edit</button> <button data-id="${l.id}" class="del px-2 py-1 bg-red-600 text-white rounded">Delete</button></td>`
+  return tr
+}
+
+function rowFor(id) {
+  return tbody.querySelector(`tr[data-id="${id}"]`)
+}
+
+function prepend(l) {
+  // Newest first: a new lead belongs at the top of page 1
+  if (page !== 1 || rowFor(l.id)) return
+  tbody.prepend(renderRow(l))
+  while (tbody.rows.length > limit) tbody.lastElementChild.remove()
+}
+
+function applyChange(c) {
+  // One event from the change feed; our own writes come back too and are skipped by version
+  const tr = rowFor(c.id)
+  if (c.op === 'delete' || !c.lead) {
+    if (tr) tr.remove()
+    shown.delete(c.id)
+    return
+  }
+  if (!tr) {
+    if (c.op === 'insert') prepend(c.lead)
+    return
+  }
+  if (Number(tr.getAttribute('data-version')) >= c.lead.version) return
+  if (tr.querySelector('.e-name')) shown.set(c.id, c.lead)  // being edited: Cancel shows the new values
+  else tr.replaceWith(renderRow(c.lead))
+}
+
+function handleEvent(block) {
+  let event = 'message', data = '', id = null
+  for (const line of block.split('\n')) {
+    if (line.startsWith('id: ')) id = line.slice(4)
+    else if (line.startsWith('event: ')) event = line.slice(7)
+    else if (line.startsWith('data: ')) data += line.slice(6)
+  }
+  if (id !== null) lastEventId = id
+  if (event === 'lead') applyChange(JSON.parse(data))
+  if (event === 'reset') { lastEventId = null; load() }
+}
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms))
+
+async function poll(until) {
+  // Fallback when there is no change feed (off on Vercel and sync workers, where a stream
+  // would hold the only thread): a conditional re-read of the visible page, answered 304
+  // from the page cache while nothing changed. Skipped while the tab is hidden or a row is
+  // being edited (a re-render would drop the inputs)
+  while (until === undefined || Date.now() < until) {
+    await sleep(POLL_MS)
+    if (document.hidden || tbody.querySelector('.e-name')) continue
+    try { await load(true) } catch (err) {}
+  }
+}
+
+async function follow() {
+  // GET /api/leads/changes over fetch (EventSource cannot send the bearer token); the
+  // server ends each stream after a while and we resume from the last event id.
+  // Feed turned off or unsupported (501): poll. All streams busy (503): poll for a minute
+  for (;;) {
+    try {
+      const headers = { 'Authorization': 'Bearer ' + token }
+      if (lastEventId) headers['Last-Event-ID'] = lastEventId
+      const r = await fetch('/api/leads/changes', { headers })
+      if (r.status === 401) { location.href = '/login'; return }
+      if (r.status === 501) return poll()
+      if (r.status === 503) { await poll(Date.now() + 60000); continue }
+      if (!r.ok) throw new Error('change feed ' + r.status)
+      const reader = r.body.pipeThrough(new TextDecoderStream()).getReader()
+      let buf = ''
+      for (;;) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buf += value
+        let end
+        while ((end = buf.indexOf('\n\n')) >= 0) {
+          handleEvent(buf.slice(0, end))
+          buf = buf.slice(end + 2)
+        }
+      }
+    } catch (err) {
+      await sleep(3000)
+    }
+  }
 }
 
 function toEdit(tr) {
@@ -48,8 +147,8 @@ function toEdit(tr) {
 tbody.addEventListener('click', async (e) => {
   if (e.target.classList.contains('del')) {
     const id = e.target.getAttribute('data-id')
-    await fetch('/api/leads/' + id, { method: 'DELETE', headers: { 'Authorization': 'Bearer ' + token } })
-    load()
+    const r = await fetch('/api/leads/' + id, { method: 'DELETE', headers: { 'Authorization': 'Bearer ' + token } })
+    if (r.ok || r.status === 404) applyChange({ op: 'delete', id: id, lead: null })
   }
   if (e.target.classList.contains('edit')) {
     const tr = e.target.closest('tr')
@@ -64,11 +163,13 @@ tbody.addEventListener('click', async (e) => {
       phone: tr.querySelector('.e-phone').value,
       status: tr.querySelector('.e-status').value
     }
-    await fetch('/api/leads/' + id, { method: 'PUT', headers: { 'Content-Type': 'application/json', 'Authorization': 'Bearer ' + token }, body: JSON.stringify(body) })
-    load()
+    const r = await fetch('/api/leads/' + id, { method: 'PUT', headers: { 'Content-Type': 'application/json', 'Authorization': 'Bearer ' + token }, body: JSON.stringify(body) })
+    if (r.ok) tr.replaceWith(renderRow(await r.json()))
+    else msg.textContent = 'Failed to save lead'
   }
   if (e.target.classList.contains('cancel')) {
-    load()
+    const tr = e.target.closest('tr')
+    tr.replaceWith(renderRow(shown.get(tr.getAttribute('data-id'))))
   }
 })
 
@@ -97,7 +198,7 @@ form.addEventListener('submit', async (e) => {
     })
     if (r.ok) {
       form.reset()
-      await load()
+      prepend(await r.json())
     } else {
       msg.textContent = 'Failed to add lead'
     }
@@ -108,3 +209,4 @@ form.addEventListener('submit', async (e) => {
 })
 
 load()
+follow()
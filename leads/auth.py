@@ -0,0 +1,58 @@
+# JWT issuing and verification with a bounded cache of verified claims.
+# PyJWT is imported on first use, so a cold start that only serves a page skips it.
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import os
+import threading
+import time
+
+from .metrics import JWT_DECODE_SECONDS
+
+SECRET = os.environ.get('SECRET', 'dev-secret')
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', '1024'))  # 0 disables
+
+# Verified JWT claims keyed by token hash, evicted LRU or at the token's exp
+_auth_cache = OrderedDict()
+_auth_cache_lock = threading.Lock()
+auth_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def token_for(email):
+    import jwt
+    payload = {'sub': email, 'exp': datetime.utcnow() + timedelta(hours=8)}
+    return jwt.encode(payload, SECRET, algorithm='HS256')
+
+
+def verify_token(token):
+    key = hashlib.sha256(token.encode()).digest()
+    now = time.time()
+    with _auth_cache_lock:
+        claims = _auth_cache.get(key)
+        if claims is not None:
+            if claims['exp'] > now:
+                _auth_cache.move_to_end(key)
+                auth_cache_stats['hits'] += 1
+                return claims
+            del _auth_cache[key]
+        auth_cache_stats['misses'] += 1
+    import jwt
+    with JWT_DECODE_SECONDS.time():
+        claims = jwt.decode(token, SECRET, algorithms=['HS256'])
+    if AUTH_CACHE_SIZE > 0 and 'exp' in claims:
+        with _auth_cache_lock:
+            _auth_cache[key] = claims
+            while len(_auth_cache) > AUTH_CACHE_SIZE:
+                _auth_cache.popitem(last=False)
+    return claims
+
+
+def auth_cache_info():
+    with _auth_cache_lock:
+        return dict(auth_cache_stats, size=len(_auth_cache))
+
+
+def clear_auth_cache():
+    with _auth_cache_lock:
+        _auth_cache.clear()
+        auth_cache_stats.update(hits=0, misses=0)
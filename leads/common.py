@@ -0,0 +1,228 @@
+# Lead validation and serialisation shared by every app variant (sync and async)
+import base64
+import csv
+import io
+import json
+import os
+import re
+
+from .serialize import ndjson_lines
+
+STATUSES = ['New', 'In Progress', 'Converted']
+MAX_PAGE_LIMIT = int(os.environ.get('MAX_PAGE_LIMIT', '1000'))  # GET /api/leads ?limit= is capped here
+
+# Seed data for a fresh store
+DEFAULT_USER = {'email': 'test@example.com', 'password': 'password123'}
+SAMPLE_LEADS = [
+    {'name': 'Alice', 'email': 'alice@example.com', 'phone': '1234567890', 'status': 'New'},
+    {'name': 'Bob', 'email': 'bob@example.com', 'phone': '9876543210', 'status': 'In Progress'},
+]
+
+
+def validate_lead(data):
+    # Cleaned lead fields, or None if the payload is not a valid lead
+    if not isinstance(data, dict):
+        return None
+    lead = {}
+    for key in ('name', 'email', 'phone'):
+        value = data.get(key) or ''
+        if not isinstance(value, str) or not value.strip():
+            return None
+        lead[key] = value.strip()
+    lead['status'] = data.get('status') or 'New'
+    if lead['status'] not in STATUSES:
+        return None
+    return lead
+
+
+def lead_changes(data):
+    # Non-empty fields supplied for an update, or None if any value is invalid
+    if not isinstance(data, dict):
+        return None
+    changes = {}
+    for key in ('name', 'email', 'phone'):
+        value = data.get(key) or ''
+        if not isinstance(value, str):
+            return None
+        if value.strip():
+            changes[key] = value.strip()
+    status = data.get('status')
+    if status:
+        if status not in STATUSES:
+            return None
+        changes['status'] = status
+    return changes
+
+
+def lead_filters(args):
+    # ?status=, ?email= and ?q= as backend-neutral filters; ValueError if invalid
+    filters = {}
+    status = args.get('status')
+    if status:
+        if status not in STATUSES:
+            raise ValueError('Invalid status')
+        filters['status'] = status
+    email = (args.get('email') or '').strip()
+    if email:
+        filters['email'] = email
+    terms = search_terms(args.get('q'))
+    if terms:
+        filters['terms'] = terms
+    return filters
+
+
+def row_to_lead(row):
+    # SQLite row (sqlite3.Row or dict) to the API representation
+    return {
+        'id': str(row['id']),
+        'name': row['name'],
+        'email': row['email'],
+        'phone': row['phone'],
+        'status': row['status'],
+        'version': row['version']
+    }
+
+
+def doc_to_lead(doc):
+    # Mongo document to the API representation
+    return {
+        'id': str(doc.get('_id')),
+        'name': doc.get('name', ''),
+        'email': doc.get('email', ''),
+        'phone': doc.get('phone', ''),
+        'status': doc.get('status', 'New'),
+        'version': doc.get('version', 1)
+    }
+
+
+# Column order of the lead rows LeadRepository.list_leads returns; the id keeps its
+# native type (int or ObjectId) until serialisation
+LEAD_COLUMNS = ('id', 'name', 'email', 'phone', 'status', 'version')
+
+
+def doc_to_row(doc):
+    # Mongo document to a LEAD_COLUMNS tuple
+    return (doc.get('_id'), doc.get('name', ''), doc.get('email', ''), doc.get('phone', ''),
+            doc.get('status', 'New'), doc.get('version', 1))
+
+
+def lead_from_row(row):
+    # LEAD_COLUMNS tuple to the API representation
+    return {'id': str(row[0]), 'name': row[1], 'email': row[2], 'phone': row[3], 'status': row[4], 'version': row[5]}
+
+
+def plan_batch(ops, versions):
+    # Replays batch ops [(op, id, changes, version)] in order against {id: current
+    # version}. Returns the per-op (status, version) list plus the net effect for the
+    # backend to write: {id: (merged changes, version bumps)} and the ids to delete.
+    versions = dict(versions)
+    results, updates, deleted = [], {}, []
+    for op, lead_id, changes, version in ops:
+        current = versions.get(lead_id)
+        if current is None:
+            results.append((404, None))
+        elif version is not None and version != current:
+            results.append((412, current))
+        elif op == 'delete':
+            versions[lead_id] = None
+            updates.pop(lead_id, None)
+            deleted.append(lead_id)
+            results.append((204, None))
+        else:
+            versions[lead_id] = current + 1
+            merged, bumps = updates.get(lead_id, ({}, 0))
+            updates[lead_id] = ({**merged, **changes}, bumps + 1)
+            results.append((200, current + 1))
+    return results, updates, deleted
+
+
+# Dedupe keys: normalised email and phone, stored alongside the lead and indexed.
+# Upsert and the dedupe job (leads/dedupe.py) treat leads sharing either one as the same lead.
+DEDUPE_FIELDS = {'email': 'email_norm', 'phone': 'phone_norm'}
+
+
+def normalize_email(email):
+    return email.strip().lower() or None
+
+
+def normalize_phone(phone):
+    # Digits only, so '+1 (555) 010-0000' and '15550100000' match
+    return re.sub(r'\D', '', phone) or None
+
+
+_NORMALIZERS = {'email': normalize_email, 'phone': normalize_phone}
+
+
+def with_dedupe_keys(lead):
+    # Adds email_norm / phone_norm for whichever of email and phone the dict has
+    for field, key in DEDUPE_FIELDS.items():
+        if field in lead:
+            lead[key] = _NORMALIZERS[field](lead[field])
+    return lead
+
+
+def plan_merge(rows):
+    # One duplicate group as LEAD_COLUMNS rows, oldest first. The oldest id survives
+    # with the newest name/email/phone and the furthest status; returns (survivor
+    # id, its changes, ids to delete)
+    survivor, newest = rows[0], rows[-1]
+    changes = {field: newest[pos] for pos, field in ((1, 'name'), (2, 'email'), (3, 'phone'))
+               if newest[pos] != survivor[pos]}
+    status = max((row[4] for row in rows), key=lambda s: STATUSES.index(s) if s in STATUSES else -1)
+    if status != survivor[4]:
+        changes['status'] = status
+    return survivor[0], changes, [row[0] for row in rows[1:]]
+
+
+def search_terms(q):
+    # Lowercase word tokens; each one is matched as a prefix
+    return re.findall(r'\w+', (q or '').lower())
+
+
+def with_search(lead):
+    # Token array behind ?q= prefix search in Mongo (multikey index on search)
+    lead['search'] = sorted(set(search_terms(' '.join((lead.get('name', ''), lead.get('email', ''), lead.get('phone', ''))))))
+    return lead
+
+
+def lead_document(lead):
+    # New Mongo lead as stored: version 1 plus search tokens and dedupe keys
+    lead['version'] = 1
+    return with_search(with_dedupe_keys(lead))
+
+
+def encode_cursor(lead_id):
+    # Opaque keyset cursor: the last id of the page, base64url encoded
+    return base64.urlsafe_b64encode(str(lead_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return base64.urlsafe_b64decode(padded.encode()).decode()
+
+
+def iter_bulk_rows(stream, fmt):
+    # Yields (line number, row dict or None, error) without buffering the upload
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except ValueError:
+            yield line_no, None, 'Invalid JSON'
+
+
+def export_chunk(leads, fmt):
+    # Serialise one batch of lead dicts as NDJSON lines or CSV rows
+    if fmt == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerows((l['id'], l['name'], l['email'], l['phone'], l['status']) for l in leads)
+        return buf.getvalue()
+    return ndjson_lines(leads)
@@ -0,0 +1,57 @@
+# Offline dedupe job: merges leads that share a normalised email (then phone) into
+# the oldest one, in small batches. Each batch is one short write (the SQLite writer
+# queue or one Mongo bulk_write), with a pause in between, so the API keeps serving.
+#   python -m leads.dedupe [--by email,phone] [--batch 200] [--pause 0.05] [--dry-run]
+# Uses MONGODB_URI / MONGODB_DB when set, otherwise the SQLite file at DB_PATH.
+import argparse
+from itertools import islice
+import os
+import time
+
+from .common import DEDUPE_FIELDS
+
+
+def dedupe(repo, fields=tuple(DEDUPE_FIELDS), batch=200, pause=0.05, dry_run=False, log=print):
+    # Returns (groups merged, leads removed) over all fields
+    merged = removed = 0
+    for field in fields:
+        keys = repo.duplicate_keys(field)
+        while True:
+            chunk = list(islice(keys, batch))
+            if not chunk:
+                break
+            if dry_run:
+                merged += len(chunk)
+            else:
+                groups, gone = repo.merge_duplicates(field, chunk)
+                merged += groups
+                removed += gone
+                time.sleep(pause)
+            log(f'{field}: {merged} duplicate groups so far, {removed} leads removed')
+    return merged, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge duplicate leads in batches')
+    parser.add_argument('--by', default=','.join(DEDUPE_FIELDS), help='fields to match on, in order')
+    parser.add_argument('--batch', type=int, default=200, help='duplicate groups per write')
+    parser.add_argument('--pause', type=float, default=0.05, help='seconds between writes')
+    parser.add_argument('--dry-run', action='store_true', help='only count duplicate groups')
+    args = parser.parse_args()
+    fields = [field.strip() for field in args.by.split(',') if field.strip()]
+    for field in fields:
+        if field not in DEDUPE_FIELDS:
+            parser.error(f'--by takes {", ".join(DEDUPE_FIELDS)}')
+    if os.environ.get('MONGODB_URI'):
+        from .mongo import MongoRepository
+        repo = MongoRepository(os.environ['MONGODB_URI'], os.environ.get('MONGODB_DB', 'hashai'))
+    else:
+        from .sqlite import SQLiteRepository
+        repo = SQLiteRepository()
+    repo.init_schema()  # adds and backfills the dedupe keys on an older store
+    merged, removed = dedupe(repo, fields, args.batch, args.pause, args.dry_run)
+    print(f'done: {merged} duplicate groups{" found" if args.dry_run else f", {removed} leads removed"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# Admission control for the API routes: token-bucket rate limits per client IP
+# and per token subject (429), and a cap on requests in flight per route and
+# process (503). Buckets live in this process unless RATE_LIMIT_STORE points at
+# Redis, which shares them between workers and hosts.
+from collections import OrderedDict
+import logging
+import math
+import os
+import threading
+import time
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+# "<requests per second>/<burst>"; 0 disables that limit
+RATE_LIMIT_IP = os.environ.get('RATE_LIMIT_IP', '100/200')
+RATE_LIMIT_SUB = os.environ.get('RATE_LIMIT_SUB', '50/100')
+RATE_LIMIT_LOGIN = os.environ.get('RATE_LIMIT_LOGIN', '5/20')  # per IP, on top of RATE_LIMIT_IP
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', '')  # empty: in process; redis://host:6379/0: shared
+RATE_LIMIT_KEYS = int(os.environ.get('RATE_LIMIT_KEYS', '100000'))  # in-process buckets kept (LRU)
+# Proxies in front of the app that append to X-Forwarded-For. Per-IP limits key on the
+# client address that many entries from the right (werkzeug's ProxyFix); with 0 they key on
+# the socket peer, which behind a proxy is the proxy, putting every client in one bucket.
+# Vercel's edge is one proxy and overwrites the header a client sends, hence 1 there
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', '1' if os.environ.get('VERCEL') else '0'))
+MAX_INFLIGHT = int(os.environ.get('MAX_INFLIGHT', '32'))  # per route and process; 0 = unlimited
+# Routes with their own in-flight limit (0 = exempt); change streams have CHANGES_MAX_STREAMS
+MAX_INFLIGHT_ROUTES = {
+    'leads.export_leads': int(os.environ.get('MAX_INFLIGHT_EXPORT', '2')),
+    'leads.bulk_add_leads': int(os.environ.get('MAX_INFLIGHT_BULK', '2')),
+    'leads.lead_change_stream': 0,
+}
+
+log = logging.getLogger('leads')
+
+
+def parse_rate(value):
+    # (tokens per second, burst) or None when disabled
+    rate, _, burst = value.partition('/')
+    rate = float(rate or 0)
+    if rate <= 0:
+        return None
+    return rate, float(burst) if burst else rate
+
+
+class MemoryBuckets:
+    # Token buckets for this process: key -> [tokens, last refill]
+    def __init__(self, max_keys=RATE_LIMIT_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1.0):
+        # Seconds until the request would be allowed; 0 means allowed and charged
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Same bucket as MemoryBuckets.take, atomically in Redis on the server's clock
+_REDIS_TAKE = '''
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = tonumber(redis.call('HGET', KEYS[1], 't'))
+local stamp = tonumber(redis.call('HGET', KEYS[1], 's'))
+if tokens == nil then
+    tokens, stamp = burst, now
+end
+tokens = math.min(burst, tokens + math.max(0, now - stamp) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 's', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+'''
+
+
+class RedisBuckets:
+    def __init__(self, url, prefix='leads:rate:'):
+        import redis  # optional dependency, only for a shared store
+        self.client = redis.Redis.from_url(url, socket_timeout=0.25)
+        self.prefix = prefix
+        self._take = self.client.register_script(_REDIS_TAKE)
+
+    def take(self, key, rate, burst, cost=1.0):
+        try:
+            return float(self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+        except Exception as e:
+            # Fail open: an unreachable store must not take the API down with it
+            log.warning('Rate limit store unavailable, admitting request: %s', e)
+            return 0.0
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class Limiter:
+    def __init__(self, store=None, ip=RATE_LIMIT_IP, sub=RATE_LIMIT_SUB, login=RATE_LIMIT_LOGIN,
+                 max_inflight=MAX_INFLIGHT, route_inflight=None, enabled=RATE_LIMIT_ENABLED,
+                 trusted_proxies=TRUSTED_PROXIES):
+        if store is None:
+            store = RedisBuckets(RATE_LIMIT_STORE) if RATE_LIMIT_STORE else MemoryBuckets()
+        self.store = store
+        self.enabled = enabled
+        self.trusted_proxies = trusted_proxies
+        self.rates = {'ip': parse_rate(ip), 'sub': parse_rate(sub), 'login': parse_rate(login)}
+        self.max_inflight = max_inflight
+        self.route_inflight = dict(MAX_INFLIGHT_ROUTES if route_inflight is None else route_inflight)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def retry_after(self, kind, key):
+        # Seconds to wait (rounded up for Retry-After) if `key` is over the `kind` limit, else 0
+        rate = self.rates[kind]
+        if not self.enabled or rate is None or key is None:
+            return 0
+        wait = self.store.take(f'{kind}:{key}', *rate)
+        return math.ceil(wait) if wait > 0 else 0
+
+    def slots(self, route):
+        # Semaphore bounding requests in flight on route, or None when unlimited
+        limit = self.route_inflight.get(route, self.max_inflight)
+        if not self.enabled or limit <= 0:
+            return None
+        with self._lock:
+            slots = self._inflight.get(route)
+            if slots is None:
+                slots = self._inflight[route] = threading.BoundedSemaphore(limit)
+            return slots
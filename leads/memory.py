@@ -0,0 +1,272 @@
+# In-process lead repository: no external services, for benchmarks, tests and
+# single-process deployments. Ids are kept in ascending lists (all leads, per
+# status, per email, per dedupe key), so pages and keyset cursors are bisect slices rather than scans.
+from collections import deque
+from operator import itemgetter
+import bisect
+import threading
+
+from .common import (DEDUPE_FIELDS, DEFAULT_USER, LEAD_COLUMNS, SAMPLE_LEADS, plan_merge, row_to_lead, search_terms,
+                     with_dedupe_keys)
+from .repository import ChangesExpired, LeadRepository
+
+_lead_row = itemgetter(*LEAD_COLUMNS)
+CHANGE_LOG_SIZE = 100000  # same window as the SQLite lead_changes trim
+
+
+class InMemoryRepository(LeadRepository):
+    name = 'memory'
+
+    def __init__(self, seed=True):
+        super().__init__()
+        self.seed = seed
+        self._lock = threading.RLock()
+        self._users = {}
+        self._leads = {}  # id -> stored lead
+        self._ids = []
+        self._by_status = {}
+        self._by_email = {}
+        self._by_key = {key: {} for key in DEDUPE_FIELDS.values()}  # email_norm / phone_norm -> ids
+        self._next_id = 1
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)  # (seq, op, lead id)
+        self._change_seq = 0
+
+    def init_schema(self):
+        with self._lock:
+            if self.seed and not self._users:
+                self._users[DEFAULT_USER['email']] = DEFAULT_USER['password']
+            if self.seed and not self._leads:
+                for lead in SAMPLE_LEADS:
+                    self._insert(lead)
+        return None
+
+    @staticmethod
+    def _index_add(index, key, lead_id):
+        ids = index.setdefault(key, [])
+        if not ids or ids[-1] < lead_id:
+            ids.append(lead_id)
+        else:
+            bisect.insort(ids, lead_id)
+
+    @staticmethod
+    def _index_remove(index, key, lead_id):
+        ids = index.get(key)
+        if ids:
+            pos = bisect.bisect_left(ids, lead_id)
+            if pos < len(ids) and ids[pos] == lead_id:
+                del ids[pos]
+            if not ids:
+                del index[key]
+
+    def _log_change(self, op, lead_id):
+        self._change_seq += 1
+        self._changes.append((self._change_seq, op, lead_id))
+
+    def _tokens(self, lead):
+        return set(search_terms(' '.join((lead['name'], lead['email'], lead['phone']))))
+
+    def _index_keys(self, stored, add):
+        for key, index in self._by_key.items():
+            if stored[key] is not None:
+                (self._index_add if add else self._index_remove)(index, stored[key], stored['id'])
+
+    def _insert(self, lead):
+        lead_id = self._next_id
+        self._next_id += 1
+        stored = {'id': lead_id, 'name': lead['name'], 'email': lead['email'], 'phone': lead['phone'],
+                  'status': lead['status'], 'version': 1}
+        stored['search'] = self._tokens(stored)
+        with_dedupe_keys(stored)
+        self._leads[lead_id] = stored
+        self._ids.append(lead_id)  # ids only grow, so appending keeps the list sorted
+        self._index_add(self._by_status, stored['status'], lead_id)
+        self._index_add(self._by_email, stored['email'], lead_id)
+        self._index_keys(stored, True)
+        self._log_change('insert', lead_id)
+        return stored
+
+    def parse_id(self, lead_id):
+        return int(lead_id)
+
+    def get_password_hash(self, email):
+        with self._lock:
+            return self._users.get(email)
+
+    def set_password_hash(self, email, old, new):
+        with self._lock:
+            if self._users.get(email) == old:
+                self._users[email] = new
+
+    def health(self):
+        with self._lock:
+            return {'database': 'in-memory', 'user_count': len(self._users), 'leads_count': len(self._leads),
+                    'test_user_exists': DEFAULT_USER['email'] in self._users}
+
+    def _matches(self, stored, filters):
+        if 'status' in filters and stored['status'] != filters['status']:
+            return False
+        if 'email' in filters and stored['email'] != filters['email']:
+            return False
+        for term in filters.get('terms', ()):
+            if not any(token.startswith(term) for token in stored['search']):
+                return False
+        return True
+
+    def list_leads(self, filters, count_mode, limit, offset=0, after_id=None):
+        with self._lock:
+            # Narrowest id index for the equality filters; remaining filters are checked per lead
+            candidates = self._ids
+            if 'status' in filters:
+                candidates = self._by_status.get(filters['status'], [])
+            if 'email' in filters:
+                by_email = self._by_email.get(filters['email'], [])
+                if len(by_email) < len(candidates):
+                    candidates = by_email
+            end = bisect.bisect_left(candidates, after_id) if after_id is not None else len(candidates)
+            if 'terms' not in filters and len(filters) < 2:
+                # The index is the answer: slice it
+                total = len(candidates) if count_mode != 'none' else None
+                stop = max(0, end - offset)
+                ids = candidates[max(0, stop - limit - 1):stop][::-1]
+            else:
+                total = None
+                if count_mode != 'none':
+                    total = sum(1 for lead_id in candidates if self._matches(self._leads[lead_id], filters))
+                ids, skipped = [], 0
+                for pos in range(end - 1, -1, -1):
+                    lead_id = candidates[pos]
+                    if not self._matches(self._leads[lead_id], filters):
+                        continue
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    ids.append(lead_id)
+                    if len(ids) > limit:
+                        break
+            rows = [_lead_row(self._leads[lead_id]) for lead_id in ids[:limit]]
+        return rows, total, len(ids) > limit
+
+    def lead_stats(self):
+        # The per-status id index is the counter
+        with self._lock:
+            return {status: len(ids) for status, ids in self._by_status.items()}
+
+    def iter_leads(self, batch_size):
+        # Snapshot of the ids, then batches looked up under the lock
+        with self._lock:
+            ids = self._ids[::-1]
+        for start in range(0, len(ids), batch_size):
+            with self._lock:
+                batch = [row_to_lead(self._leads[lead_id]) for lead_id in ids[start:start + batch_size]
+                         if lead_id in self._leads]
+            if batch:
+                yield batch
+
+    def get_lead(self, lead_id):
+        with self._lock:
+            stored = self._leads.get(lead_id)
+            return row_to_lead(stored) if stored else None
+
+    def lead_version(self, lead_id):
+        with self._lock:
+            stored = self._leads.get(lead_id)
+            return stored['version'] if stored else None
+
+    def add_lead(self, lead):
+        with self._lock:
+            return row_to_lead(self._insert(lead))
+
+    def insert_leads(self, leads):
+        with self._lock:
+            for lead in leads:
+                self._insert(lead)
+        return len(leads), []
+
+    def update_lead(self, lead_id, changes, version=None):
+        with self._lock:
+            stored = self._leads.get(lead_id)
+            if stored is None or (version is not None and stored['version'] != version):
+                return None
+            if 'status' in changes and changes['status'] != stored['status']:
+                self._index_remove(self._by_status, stored['status'], lead_id)
+                self._index_add(self._by_status, changes['status'], lead_id)
+            if 'email' in changes and changes['email'] != stored['email']:
+                self._index_remove(self._by_email, stored['email'], lead_id)
+                self._index_add(self._by_email, changes['email'], lead_id)
+            self._index_keys(stored, False)
+            stored.update(changes)
+            with_dedupe_keys(stored)
+            self._index_keys(stored, True)
+            stored['version'] += 1
+            stored['search'] = self._tokens(stored)
+            self._log_change('update', lead_id)
+            return row_to_lead(stored)
+
+    def upsert_lead(self, lead, changes):
+        with self._lock:
+            keys = with_dedupe_keys({'email': lead['email'], 'phone': lead['phone']})
+            for key, index in self._by_key.items():
+                ids = index.get(keys[key])
+                if ids:
+                    return self.update_lead(ids[0], changes), False
+            return row_to_lead(self._insert(lead)), True
+
+    def duplicate_keys(self, field, batch_size=1000):
+        with self._lock:
+            keys = sorted(key for key, ids in self._by_key[DEDUPE_FIELDS[field]].items() if len(ids) > 1)
+        yield from keys
+
+    def merge_duplicates(self, field, keys):
+        merged = removed = 0
+        with self._lock:
+            index = self._by_key[DEDUPE_FIELDS[field]]
+            for key in keys:
+                ids = list(index.get(key, ()))
+                if len(ids) < 2:
+                    continue
+                survivor, changes, duplicates = plan_merge([_lead_row(self._leads[lead_id]) for lead_id in ids])
+                if changes:
+                    self.update_lead(survivor, changes)
+                for lead_id in duplicates:
+                    self.delete_lead(lead_id)
+                merged += 1
+                removed += len(duplicates)
+        return merged, removed
+
+    def apply_batch(self, ops):
+        # The lock makes the sequential default atomic
+        with self._lock:
+            return super().apply_batch(ops)
+
+    def delete_lead(self, lead_id):
+        with self._lock:
+            stored = self._leads.pop(lead_id, None)
+            if stored is None:
+                return False
+            self._index_remove(self._by_status, stored['status'], lead_id)
+            self._index_remove(self._by_email, stored['email'], lead_id)
+            self._index_keys(stored, False)
+            pos = bisect.bisect_left(self._ids, lead_id)
+            del self._ids[pos]
+            self._log_change('delete', lead_id)
+            return True
+
+    def changes(self, after, limit):
+        with self._lock:
+            if after is None:
+                return [], str(self._change_seq)
+            seq = int(after)
+            if seq < 0:
+                raise ValueError('Invalid resume token')
+            if seq >= self._change_seq:
+                return [], str(seq)
+            first = self._changes[0][0]
+            if seq + 1 < first:
+                raise ChangesExpired()
+            events = []
+            for pos in range(seq + 1 - first, min(len(self._changes), seq + 1 - first + limit)):
+                change_seq, op, lead_id = self._changes[pos]
+                stored = self._leads.get(lead_id)
+                events.append((str(change_seq), {'op': op, 'id': str(lead_id),
+                                                 'lead': row_to_lead(stored) if stored else None}))
+        return events, events[-1][0]
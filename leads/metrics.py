@@ -0,0 +1,147 @@
+# In-process latency histograms exposed in Prometheus text format (GET /metrics),
+# plus the per-request list of timed DB operations used by the slow-request log.
+# Values are per worker process; scrape each worker or run a single process.
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))  # 0 disables the slow log
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (operation, statement, seconds) for each DB call made by the current request
+_operations = ContextVar('leads_operations', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *labels):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, counts in series:
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = ','.join(pairs + [f'le="{bound}"'])
+                lines.append(f'{self.name}_bucket{{{le}}} {cumulative}')
+            suffix = '{' + ','.join(pairs) + '}' if pairs else ''
+            lines.append(f'{self.name}_sum{suffix} {counts[-1]}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            pairs = ','.join(f'{name}="{_escape(v)}"' for name, v in zip(self.labelnames, labels))
+            lines.append(f'{self.name}{{{pairs}}} {value}' if pairs else f'{self.name} {value}')
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('leads_http_request_duration_seconds', 'HTTP request latency by route',
+                            ('method', 'route', 'status'))
+DB_SECONDS = Histogram('leads_db_operation_duration_seconds', 'Database call latency by operation',
+                       ('backend', 'operation'))
+DB_CONNECT_SECONDS = Histogram('leads_db_connect_duration_seconds', 'Time to obtain a database connection',
+                               ('backend', 'source'))
+JWT_DECODE_SECONDS = Histogram('leads_jwt_decode_duration_seconds', 'JWT signature verification (cache misses)')
+SERIALIZE_SECONDS = Histogram('leads_serialize_duration_seconds', 'Response body serialisation by route',
+                              ('route',))
+PASSWORD_VERIFY_SECONDS = Histogram('leads_password_verify_seconds', 'Password hash check in the verification pool')
+REJECTED = Counter('leads_rejected_requests_total', 'Requests shed before doing their work', ('route', 'reason'))
+METRICS = (REQUEST_SECONDS, DB_SECONDS, DB_CONNECT_SECONDS, JWT_DECODE_SECONDS, SERIALIZE_SECONDS,
+           PASSWORD_VERIFY_SECONDS, REJECTED)
+
+
+@contextmanager
+def db_operation(backend, operation, statement):
+    # Times one DB call into DB_SECONDS and the current request's operation list
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        DB_SECONDS.observe(elapsed, backend, operation)
+        record_operation(operation, statement, elapsed)
+
+
+def record_operation(operation, statement, seconds):
+    operations = _operations.get()
+    if operations is not None:
+        operations.append((operation, statement, seconds))
+
+
+def start_request():
+    _operations.set([])
+
+
+def request_operations():
+    return _operations.get() or []
+
+
+def render():
+    return '\n'.join(m.render() for m in METRICS) + '\n'
+
+
+def reset():
+    for m in METRICS:
+        m.clear()
@@ -0,0 +1,548 @@
+# MongoDB lead repository
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+import os
+import re
+import threading
+import time
+
+from bson.objectid import ObjectId
+from pymongo import MongoClient, ASCENDING, DESCENDING, DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConfigurationError, OperationFailure
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from pymongo.write_concern import WriteConcern
+
+from .common import (DEDUPE_FIELDS, DEFAULT_USER, LEAD_COLUMNS, SAMPLE_LEADS, doc_to_lead, doc_to_row, lead_document,
+                     plan_batch, plan_merge, with_dedupe_keys, with_search)
+from .metrics import db_operation
+from .repository import ChangesExpired, LeadRepository, current_client
+
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))  # connections per process and server
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+# Read preference for list and count queries; single-lead reads and writes use the primary
+MONGO_LIST_READ_PREFERENCE = os.environ.get('MONGO_LIST_READ_PREFERENCE', 'secondaryPreferred')
+MONGO_MAX_STALENESS = int(os.environ.get('MONGO_MAX_STALENESS', '-1'))  # seconds, >= 90; -1 = no limit
+# Write concern: w is a node count or tag such as "majority"; empty keeps the server default
+MONGO_WRITE_CONCERN = os.environ.get('MONGO_WRITE_CONCERN', '')
+MONGO_WRITE_JOURNAL = os.environ.get('MONGO_WRITE_JOURNAL', '')  # "1" / "0"; empty = server default
+MONGO_WRITE_TIMEOUT_MS = int(os.environ.get('MONGO_WRITE_TIMEOUT_MS', '0'))  # 0 = wait indefinitely
+# After a client writes, its reads run in a causally consistent session for this long (0 disables)
+MONGO_CAUSAL_TTL = float(os.environ.get('MONGO_CAUSAL_TTL', '30'))
+MONGO_CAUSAL_CLIENTS = 10000
+
+READ_PREFERENCES = {'primary': Primary, 'primaryPreferred': PrimaryPreferred, 'secondary': Secondary,
+                    'secondaryPreferred': SecondaryPreferred, 'nearest': Nearest}
+TEXT_FIELDS = {'name', 'email', 'phone'}
+CHANGE_OPS = {'insert': 'insert', 'update': 'update', 'replace': 'update', 'delete': 'delete'}
+CHANGE_STREAM_UNSUPPORTED = 40573  # standalone mongod: change streams need a replica set
+CHANGE_HISTORY_LOST = (280, 286)  # ChangeStreamFatalError, ChangeStreamHistoryLost
+_PAGE_FIELDS = dict.fromkeys(LEAD_COLUMNS[1:], 1)  # _id comes back anyway; skips the search tokens
+_BATCH_FIELDS = dict.fromkeys(('version', 'status', *TEXT_FIELDS), 1)
+STATUS_COUNTERS = {'_id': {'$regex': '^status:'}}  # counters collection: {_id: 'status:<status>', value}
+STATUS_COUNT_PIPELINE = [{'$group': {'_id': {'$ifNull': ['$status', 'New']}, 'n': {'$sum': 1}}}]
+
+
+def read_preference(mode, max_staleness=-1):
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f'Unknown read preference {mode!r}')
+    return Primary() if mode == 'primary' else READ_PREFERENCES[mode](max_staleness=max_staleness)
+
+
+def write_concern(w=MONGO_WRITE_CONCERN, journal=MONGO_WRITE_JOURNAL, timeout_ms=MONGO_WRITE_TIMEOUT_MS):
+    options = {}
+    if w:
+        options['w'] = int(w) if w.isdigit() else w
+    if journal:
+        options['j'] = journal == '1'
+    if timeout_ms:
+        options['wtimeout'] = timeout_ms
+    return WriteConcern(**options)
+
+
+def status_seed_requests(counts):
+    # $setOnInsert, not $inc: workers starting together each count, but only the first
+    # insert of a counter sets it, so the totals are never added twice
+    return [UpdateOne({'_id': 'status:' + status}, {'$setOnInsert': {'value': n}}, upsert=True)
+            for status, n in counts.items()]
+
+
+def seeded_already(error):
+    # BulkWriteError from status_seed_requests: two upserts racing on one _id, and the
+    # loser's duplicate key means the counter is seeded already
+    return all(e['code'] == 11000 for e in error.details['writeErrors'])
+
+
+def _shape(query):
+    # Field names only, so slow-request logs never carry lead data
+    return '{' + ', '.join(sorted(query)) + '}'
+
+
+class MongoRepository(LeadRepository):
+    name = 'mongo'
+    default_count_mode = 'estimated'
+
+    def __init__(self, uri, db_name, count_ttl=5.0, backfill_batch=1000, max_pool_size=MONGO_MAX_POOL_SIZE,
+                 min_pool_size=MONGO_MIN_POOL_SIZE, list_read_preference=MONGO_LIST_READ_PREFERENCE,
+                 max_staleness=MONGO_MAX_STALENESS, causal_ttl=MONGO_CAUSAL_TTL):
+        super().__init__()
+        # The client is built on first use: MongoClient resolves mongodb+srv hosts and starts
+        # its monitor threads when constructed, which would otherwise stall the app's import
+        self._client_options = (uri, db_name, {'maxPoolSize': max_pool_size, 'minPoolSize': min_pool_size})
+        # List pages and counts may be served by secondaries
+        self._list_read_preference = read_preference(list_read_preference, max_staleness)
+        self._client = self._db = self._lead_reads = None
+        self._client_lock = threading.Lock()
+        self.count_ttl = count_ttl
+        self.backfill_batch = backfill_batch
+        self.causal_ttl = causal_ttl
+        self._count_cache = {'value': None, 'expires': 0.0}
+        self._writes = OrderedDict()  # client -> (cluster time, operation time, expiry) of its last write
+        self._writes_lock = threading.Lock()
+
+    def _connect(self):
+        with self._client_lock:
+            if self._client is None:
+                uri, db_name, options = self._client_options
+                client = MongoClient(uri, **options)
+                self._db = client.get_database(db_name, write_concern=write_concern())
+                self._lead_reads = self._db.get_collection('leads', read_preference=self._list_read_preference)
+                self._client = client
+        return self._client
+
+    @property
+    def client(self):
+        return self._client or self._connect()
+
+    @property
+    def db(self):
+        if self._client is None:
+            self._connect()
+        return self._db
+
+    @property
+    def lead_reads(self):
+        if self._client is None:
+            self._connect()
+        return self._lead_reads
+
+    def init_schema(self):
+        db = self.db
+        # Ensure indexes
+        db.users.create_index([('email', ASCENDING)], unique=True)
+        db.leads.create_index([('status', ASCENDING), ('_id', DESCENDING)])
+        db.leads.create_index([('email', ASCENDING)])
+        db.leads.create_index([('search', ASCENDING)])
+        for key in DEDUPE_FIELDS.values():
+            db.leads.create_index([(key, ASCENDING), ('_id', ASCENDING)])
+        # Seed a default user and sample leads if none
+        if db.users.count_documents({}) == 0:
+            db.users.insert_one(dict(DEFAULT_USER))
+        if db.leads.count_documents({}) == 0:
+            db.leads.insert_many([lead_document(dict(lead)) for lead in SAMPLE_LEADS])
+        # Leads created before versioning start at version 1
+        db.leads.update_many({'version': {'$exists': False}}, {'$set': {'version': 1}})
+        # Backfill search tokens for leads created before search existed
+        batch = []
+        for doc in db.leads.find({'search': {'$exists': False}}, {'name': 1, 'email': 1, 'phone': 1}):
+            batch.append(UpdateOne({'_id': doc['_id']}, {'$set': {'search': with_search(doc)['search']}}))
+            if len(batch) >= self.backfill_batch:
+                db.leads.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            db.leads.bulk_write(batch, ordered=False)
+            batch = []
+        # Backfill dedupe keys likewise
+        for doc in db.leads.find({'email_norm': {'$exists': False}}, {'email': 1, 'phone': 1}):
+            keys = with_dedupe_keys({'email': doc.get('email', ''), 'phone': doc.get('phone', '')})
+            batch.append(UpdateOne({'_id': doc['_id']}, {'$set': {key: keys[key] for key in DEDUPE_FIELDS.values()}}))
+            if len(batch) >= self.backfill_batch:
+                db.leads.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            db.leads.bulk_write(batch, ordered=False)
+        # Per-status counters start from a full count once
+        if db.counters.count_documents(STATUS_COUNTERS) == 0:
+            self._seed_stats()
+        self.invalidate_count()
+
+    def invalidate_count(self):
+        self._count_cache['value'] = None
+
+    def _count_statuses(self, deltas, session=None):
+        # $inc right after the lead write it follows: no multi-document transaction, so a
+        # crash in between leaves drift for reconcile_stats to correct
+        requests = [UpdateOne({'_id': 'status:' + status}, {'$inc': {'value': n}}, upsert=True)
+                    for status, n in deltas.items() if n]
+        if requests:
+            with self._op('write', f'counters.bulk_write $inc [{len(requests)}]'):
+                self.db.counters.bulk_write(requests, ordered=False, session=session)
+
+    def parse_id(self, lead_id):
+        try:
+            return ObjectId(lead_id)
+        except Exception as e:
+            raise ValueError(str(e))
+
+    def _op(self, operation, statement):
+        return db_operation(self.name, operation, statement)
+
+    def _last_write(self, client):
+        with self._writes_lock:
+            seen = self._writes.get(client)
+            if seen is not None and seen[2] <= time.monotonic():
+                del self._writes[client]
+                seen = None
+            return seen
+
+    def _remember_write(self, client, session):
+        if session.operation_time is None:
+            return
+        with self._writes_lock:
+            self._writes[client] = (session.cluster_time, session.operation_time, time.monotonic() + self.causal_ttl)
+            self._writes.move_to_end(client)
+            while len(self._writes) > MONGO_CAUSAL_CLIENTS:
+                self._writes.popitem(last=False)
+
+    @contextmanager
+    def _session(self, write=False):
+        # Read-your-writes for the current client: its writes run in a causally consistent
+        # session whose operation time is kept, and its reads for causal_ttl seconds after
+        # start from that time, so a lagging secondary waits before answering. Other
+        # reads get no session (None) and no extra cost.
+        client = current_client.get()
+        seen = self._last_write(client) if client is not None and self.causal_ttl > 0 else None
+        if client is None or self.causal_ttl <= 0 or not (write or seen):
+            yield None
+            return
+        try:
+            session = self.client.start_session(causal_consistency=True)
+        except ConfigurationError:
+            self.causal_ttl = 0  # deployment without sessions
+            yield None
+            return
+        with session:
+            if seen:
+                session.advance_cluster_time(seen[0])
+                session.advance_operation_time(seen[1])
+            yield session
+            if write:
+                self._remember_write(client, session)
+
+    def get_password_hash(self, email):
+        with self._op('auth', 'users.find_one {email}'):
+            user = self.db.users.find_one({'email': email}, {'password': 1})
+        return user.get('password') if user else None
+
+    def set_password_hash(self, email, old, new):
+        with self._op('write', 'users.update_one {email, password} $set {password}'):
+            self.db.users.update_one({'email': email, 'password': old}, {'$set': {'password': new}})
+
+    def health(self):
+        return {'database': 'MongoDB connected',
+                'user_count': self.db.users.count_documents({}),
+                'leads_count': self.db.leads.estimated_document_count(),
+                'test_user_exists': self.db.users.find_one({'email': DEFAULT_USER['email']}) is not None}
+
+    def _query(self, filters):
+        query = {}
+        if 'status' in filters:
+            query['status'] = filters['status']
+        if 'email' in filters:
+            query['email'] = filters['email']
+        if filters.get('terms'):
+            # Anchored, case-sensitive regexes on lowercase tokens stay index range scans
+            query['$and'] = [{'search': {'$regex': '^' + re.escape(term)}} for term in filters['terms']]
+        return query
+
+    def _count(self, mode, query, session=None):
+        # estimated: collection metadata, cached for count_ttl seconds; exact: full count
+        if mode == 'none':
+            return None
+        if query or mode == 'exact':
+            with self._op('count', f'leads.count_documents {_shape(query)}'):
+                return self.lead_reads.count_documents(query, session=session)
+        now = time.monotonic()
+        if self._count_cache['value'] is None or now >= self._count_cache['expires']:
+            with self._op('count', 'leads.estimated_document_count'):
+                self._count_cache['value'] = self.lead_reads.estimated_document_count()
+            self._count_cache['expires'] = now + self.count_ttl
+        return self._count_cache['value']
+
+    def list_leads(self, filters, count_mode, limit, offset=0, after_id=None):
+        query = self._query(filters)
+        with self._session() as session:
+            total = self._count(count_mode, query, session)
+            # Fetch one extra document to know whether another page follows
+            if after_id is not None:
+                query['_id'] = {'$lt': after_id}
+                cursor = self.lead_reads.find(query, _PAGE_FIELDS, sort=[('_id', DESCENDING)], session=session)
+                cursor = cursor.limit(limit + 1)
+            else:
+                cursor = self.lead_reads.find(query, _PAGE_FIELDS, sort=[('_id', DESCENDING)], session=session)
+                cursor = cursor.skip(offset).limit(limit + 1)
+            with self._op('page', f'leads.find {_shape(query)} sort _id -1 skip {offset} limit {limit + 1}'):
+                docs = list(cursor)
+        return [doc_to_row(doc) for doc in docs[:limit]], total, len(docs) > limit
+
+    def lead_stats(self):
+        with self._op('count', 'counters.find {_id: /^status:/}'):
+            return {doc['_id'][7:]: doc['value'] for doc in self.db.counters.find(STATUS_COUNTERS)}
+
+    def reconcile_stats(self):
+        # $group count between two reads of the counters. The correction goes in as a
+        # relative $inc, and only for statuses whose counter did not move meanwhile, so
+        # writes during the scan are neither lost nor counted twice
+        before = self.lead_stats()
+        actual = self._status_counts()
+        after = self.lead_stats()
+        drift = {status: (after.get(status, 0), actual.get(status, 0)) for status in after.keys() | actual.keys()
+                 if before.get(status, 0) == after.get(status, 0) and after.get(status, 0) != actual.get(status, 0)}
+        self._count_statuses({status: have - was for status, (was, have) in drift.items()})
+        return drift
+
+    def _status_counts(self):
+        with self._op('count', 'leads.aggregate $group status'):
+            return {doc['_id']: doc['n'] for doc in self.db.leads.aggregate(STATUS_COUNT_PIPELINE, allowDiskUse=True)}
+
+    def _seed_stats(self):
+        requests = status_seed_requests(self._status_counts())
+        if not requests:
+            return
+        try:
+            with self._op('write', f'counters.bulk_write $setOnInsert [{len(requests)}]'):
+                self.db.counters.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            if not seeded_already(e):
+                raise
+
+    def iter_leads(self, batch_size):
+        # Driver fetches batch_size documents per round trip; one batch in memory
+        batch = []
+        for doc in self.db.leads.find({}, sort=[('_id', DESCENDING)], batch_size=batch_size):
+            batch.append(doc_to_lead(doc))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def get_lead(self, lead_id):
+        with self._session() as session, self._op('read', 'leads.find_one {_id}'):
+            doc = self.db.leads.find_one({'_id': lead_id}, session=session)
+        return doc_to_lead(doc) if doc else None
+
+    def lead_version(self, lead_id):
+        with self._session() as session, self._op('read', 'leads.find_one {_id}'):
+            doc = self.db.leads.find_one({'_id': lead_id}, {'version': 1}, session=session)
+        return doc.get('version', 1) if doc else None
+
+    def add_lead(self, lead):
+        doc = lead_document(dict(lead))
+        with self._session(write=True) as session, self._op('write', 'leads.insert_one'):
+            self.db.leads.insert_one(doc, session=session)  # sets doc['_id']
+            self._count_statuses({doc['status']: 1}, session)
+        self.invalidate_count()
+        return doc_to_lead(doc)
+
+    def insert_leads(self, leads):
+        # Unordered insert: one bad document does not stop the rest of the chunk
+        docs = [lead_document(dict(lead)) for lead in leads]
+        try:
+            with self._session(write=True) as session, self._op('write', f'leads.insert_many [{len(docs)}]'):
+                inserted = len(self.db.leads.insert_many(docs, ordered=False, session=session).inserted_ids)
+            errors = []
+        except BulkWriteError as e:
+            inserted = e.details.get('nInserted', 0)
+            errors = [(err['index'], err.get('errmsg', 'Write error')) for err in e.details.get('writeErrors', [])]
+        failed = {index for index, _ in errors}
+        self._count_statuses(Counter(doc['status'] for index, doc in enumerate(docs) if index not in failed))
+        self.invalidate_count()
+        return inserted, errors
+
+    def update_lead(self, lead_id, changes, version=None):
+        # Single conditional update
+        changes = with_dedupe_keys(dict(changes))
+        if TEXT_FIELDS <= changes.keys():
+            with_search(changes)
+        query = {'_id': lead_id}
+        if version is not None:
+            query['version'] = version
+        with self._session(write=True) as session:
+            with self._op('write', f'leads.find_one_and_update {_shape(query)} $set {_shape(changes)}'):
+                if 'status' in changes:
+                    # The old status is needed for the counters: take the document before, apply the update here
+                    updated = self.db.leads.find_one_and_update(query, {'$set': changes, '$inc': {'version': 1}},
+                                                                return_document=ReturnDocument.BEFORE, session=session)
+                    if updated and updated.get('status', 'New') != changes['status']:
+                        self._count_statuses({updated.get('status', 'New'): -1, changes['status']: 1}, session)
+                    if updated:
+                        updated = {**updated, **changes, 'version': updated.get('version', 1) + 1}
+                else:
+                    updated = self.db.leads.find_one_and_update(query, {'$set': changes, '$inc': {'version': 1}},
+                                                                return_document=ReturnDocument.AFTER, session=session)
+            if updated and TEXT_FIELDS & changes.keys() and 'search' not in changes:
+                # Partial text edit: search tokens need the stored values too
+                with self._op('write', 'leads.update_one {_id} $set {search}'):
+                    self.db.leads.update_one({'_id': lead_id},
+                                             {'$set': {'search': with_search(dict(updated))['search']}},
+                                             session=session)
+        return doc_to_lead(updated) if updated else None
+
+    def upsert_lead(self, lead, changes):
+        # Lookup on the dedupe indexes, then update_lead or add_lead. Two concurrent upserts
+        # of a new lead can both insert (no unique index while old duplicates exist); the
+        # dedupe job merges them later
+        keys = with_dedupe_keys({'email': lead['email'], 'phone': lead['phone']})
+        match = None
+        with self._session() as session:
+            for key in DEDUPE_FIELDS.values():
+                if keys[key] is None:
+                    continue
+                with self._op('read', f'leads.find_one {{{key}}} sort _id 1'):
+                    match = self.db.leads.find_one({key: keys[key]}, {'_id': 1}, sort=[('_id', ASCENDING)],
+                                                   session=session)
+                if match is not None:
+                    break
+        if match is not None:
+            updated = self.update_lead(match['_id'], changes)
+            if updated is not None:  # else deleted in between
+                return updated, False
+        return self.add_lead(lead), True
+
+    def duplicate_keys(self, field, batch_size=1000):
+        # One aggregation streamed batch_size keys per round trip
+        key = DEDUPE_FIELDS[field]
+        pipeline = [{'$match': {key: {'$type': 'string'}}}, {'$group': {'_id': f'${key}', 'n': {'$sum': 1}}},
+                    {'$match': {'n': {'$gt': 1}}}, {'$sort': {'_id': 1}}]
+        with self._op('dedupe', f'leads.aggregate $group {key}'):
+            cursor = self.db.leads.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+        for doc in cursor:
+            yield doc['_id']
+
+    def merge_duplicates(self, field, keys):
+        # One read of the groups and one unordered bulk_write, each write guarded by the
+        # version it was planned against so concurrent edits win
+        key = DEDUPE_FIELDS[field]
+        with self._op('dedupe', f'leads.find {{{key}: $in}} [{len(keys)}]'):
+            docs = list(self.db.leads.find({key: {'$in': list(keys)}}, sort=[('_id', ASCENDING)]))
+        groups, stored = {}, {}
+        for doc in docs:
+            groups.setdefault(doc.get(key), []).append(doc_to_row(doc))
+            stored[doc['_id']] = doc
+        requests, merged, deltas = [], 0, Counter()
+        for rows in groups.values():
+            if len(rows) < 2:
+                continue
+            survivor, changes, duplicates = plan_merge(rows)
+            doc = stored[survivor]
+            if 'status' in changes:
+                deltas[doc.get('status', 'New')] -= 1
+                deltas[changes['status']] += 1
+            for lead_id in duplicates:
+                deltas[stored[lead_id].get('status', 'New')] -= 1
+            if changes:
+                changes = with_dedupe_keys(changes)
+                if TEXT_FIELDS & changes.keys():
+                    changes['search'] = with_search({**doc, **changes})['search']
+                requests.append(UpdateOne({'_id': survivor, 'version': doc.get('version', 1)},
+                                          {'$set': changes, '$inc': {'version': 1}}))
+            requests.extend(DeleteOne({'_id': lead_id, 'version': stored[lead_id].get('version', 1)})
+                            for lead_id in duplicates)
+            merged += 1
+        if not requests:
+            return 0, 0
+        with self._op('write', f'leads.bulk_write [{len(requests)}]'):
+            written = self.db.leads.bulk_write(requests, ordered=False)
+        # As planned; writes skipped by a concurrent edit are left to reconcile_stats
+        self._count_statuses(deltas)
+        self.invalidate_count()
+        return merged, written.deleted_count
+
+    def delete_lead(self, lead_id):
+        with self._session(write=True) as session:
+            with self._op('write', 'leads.find_one_and_delete {_id}'):
+                deleted = self.db.leads.find_one_and_delete({'_id': lead_id}, {'status': 1}, session=session)
+            if deleted:
+                self._count_statuses({deleted.get('status', 'New'): -1}, session)
+        if deleted:
+            self.invalidate_count()
+        return deleted is not None
+
+    def apply_batch(self, ops):
+        # One read of the current versions, then one unordered bulk_write of the net
+        # changes. Every write is guarded by the version it was planned against, so a
+        # lead changed concurrently is left alone and its ops report 409.
+        ids = list({lead_id for _, lead_id, _, _ in ops})
+        with self._op('read', f'leads.find {{_id: $in}} [{len(ids)}]'):
+            stored = {doc['_id']: doc for doc in self.db.leads.find({'_id': {'$in': ids}}, _BATCH_FIELDS)}
+        results, updates, deleted = plan_batch(ops, {i: doc.get('version', 1) for i, doc in stored.items()})
+        requests, expected = [], {}
+        for lead_id, (changes, bumps) in updates.items():
+            doc = stored[lead_id]
+            changes = with_dedupe_keys(dict(changes))
+            if TEXT_FIELDS & changes.keys():
+                changes['search'] = with_search({**doc, **changes})['search']
+            requests.append(UpdateOne({'_id': lead_id, 'version': doc.get('version', 1)},
+                                      {'$set': changes, '$inc': {'version': bumps}}))
+            expected[lead_id] = doc.get('version', 1) + bumps
+        for lead_id in deleted:
+            requests.append(DeleteOne({'_id': lead_id, 'version': stored[lead_id].get('version', 1)}))
+            expected[lead_id] = None
+        if not requests:
+            return results
+        with self._session(write=True) as session, self._op('write', f'leads.bulk_write [{len(requests)}]'):
+            written = self.db.leads.bulk_write(requests, ordered=False, session=session)
+        if deleted:
+            self.invalidate_count()
+        lost = set()
+        if written.matched_count + written.deleted_count < len(requests):
+            with self._op('read', f'leads.find {{_id: $in}} [{len(expected)}]'):
+                now = {doc['_id']: doc.get('version', 1)
+                       for doc in self.db.leads.find({'_id': {'$in': list(expected)}}, {'version': 1})}
+            lost = {lead_id for lead_id, version in expected.items() if now.get(lead_id) != version}
+            results = [(409, None) if lead_id in lost and status in (200, 204) else (status, version)
+                       for (_, lead_id, _, _), (status, version) in zip(ops, results)]
+        deltas = Counter()
+        for lead_id, (changes, _) in updates.items():
+            old = stored[lead_id].get('status', 'New')
+            if lead_id not in lost and changes.get('status', old) != old:
+                deltas[old] -= 1
+                deltas[changes['status']] += 1
+        for lead_id in deleted:
+            if lead_id not in lost:
+                deltas[stored[lead_id].get('status', 'New')] -= 1
+        self._count_statuses(deltas)
+        return results
+
+    def changes(self, after, limit):
+        # Change streams (replica sets only): tokens are resume tokens, so the oplog
+        # window decides how far back a client can resume
+        options = {'full_document': 'updateLookup', 'max_await_time_ms': 50}
+        if after is not None:
+            options['resume_after'] = {'_data': after}
+        events = []
+        try:
+            with self._op('changes', 'leads.watch'):
+                with self.db.leads.watch(**options) as stream:
+                    while len(events) < limit:
+                        change = stream.try_next()
+                        if change is None:
+                            break
+                        op = CHANGE_OPS.get(change['operationType'])
+                        if op is None:
+                            if change['operationType'] == 'invalidate':
+                                raise ChangesExpired()
+                            continue
+                        doc = change.get('fullDocument')
+                        events.append((change['_id']['_data'], {'op': op, 'id': str(change['documentKey']['_id']),
+                                                                'lead': doc_to_lead(doc) if doc else None}))
+                    token = stream.resume_token
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAM_UNSUPPORTED:
+                raise NotImplementedError('Change streams need a replica set') from e
+            if e.code in CHANGE_HISTORY_LOST:
+                raise ChangesExpired() from e
+            if after is not None:
+                raise ValueError('Invalid resume token') from e
+            raise
+        return events, token['_data'] if token else after
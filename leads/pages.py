@@ -0,0 +1,34 @@
+# Static HTML pages (/login, /leads) read once per process and answered from memory
+# with a strong ETag, instead of a stat, open and read through send_from_directory on
+# every hit. Browsers still revalidate (no-cache) and get 304 once they hold the page.
+import hashlib
+import threading
+
+from flask import current_app, request
+
+
+class StaticPage:
+    def __init__(self, path, mimetype='text/html'):
+        self.path = path
+        self.mimetype = mimetype
+        self._page = None  # (body, etag), built on first request
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._page is None:
+                with open(self.path, 'rb') as f:
+                    body = f.read()
+                self._page = (body, hashlib.sha256(body).hexdigest()[:32])
+            return self._page
+
+    def response(self):
+        body, etag = self._page or self._load()
+        if request.if_none_match.contains(etag):
+            resp = current_app.response_class(status=304)
+        else:
+            resp = current_app.response_class(body, mimetype=self.mimetype)
+        resp.set_etag(etag)
+        resp.cache_control.no_cache = True
+        return resp
+
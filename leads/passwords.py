@@ -0,0 +1,220 @@
+# Password hashing and verification off the request threads. Hashes are
+# Werkzeug's "method$salt$hash" strings (scrypt by default); rows still holding a
+# plaintext or outdated hash are rehashed after the next successful login.
+#
+# Verification runs in a small process pool so a login storm burns those CPUs
+# rather than the web workers' threads. At most PASSWORD_QUEUE_LIMIT checks may
+# be pending per process; beyond that submit() raises Overloaded right away and
+# the route answers 503. Recent successes are remembered for LOGIN_CACHE_TTL
+# seconds so repeated logins with the same credentials skip the hash.
+# concurrent.futures.process and multiprocessing load with the first pool.
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import Future
+import atexit
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .metrics import PASSWORD_VERIFY_SECONDS, REJECTED
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '2'))  # 0 verifies on the request thread
+PASSWORD_QUEUE_LIMIT = int(os.environ.get('PASSWORD_QUEUE_LIMIT', '4'))  # keep below the web thread count
+PASSWORD_VERIFY_TIMEOUT = float(os.environ.get('PASSWORD_VERIFY_TIMEOUT', '5'))
+LOGIN_CACHE_SIZE = int(os.environ.get('LOGIN_CACHE_SIZE', '1024'))  # 0 disables
+LOGIN_CACHE_TTL = float(os.environ.get('LOGIN_CACHE_TTL', '300'))
+
+log = logging.getLogger('leads')
+
+
+class Overloaded(Exception):
+    pass
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+def is_hashed(stored):
+    return '$' in stored and stored.split(':', 1)[0] in ('scrypt', 'pbkdf2')
+
+
+def verify(password, stored):
+    # (ok, new hash or None, seconds). Runs in the pool: compare and, if needed, rehash there too
+    start = time.perf_counter()
+    if is_hashed(stored):
+        ok = check_password_hash(stored, password)
+        stale = ok and stored.split('$', 1)[0] != PASSWORD_HASH_METHOD
+    else:
+        # Legacy plaintext row
+        ok = hmac.compare_digest(stored.encode(), password.encode())
+        stale = ok
+    new_hash = hash_password(password) if stale else None
+    return ok, new_hash, time.perf_counter() - start
+
+
+# Per-process state; a forked worker starts with its own pool and cache
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_pool_disabled = False  # process pools unavailable here (e.g. no /dev/shm): verify inline
+_slots = threading.BoundedSemaphore(PASSWORD_QUEUE_LIMIT)
+_cache_key = secrets.token_bytes(32)
+_verified = OrderedDict()  # HMAC of email/password/stored hash -> expiry
+_dummy_hash = None
+
+
+def _executor():
+    global _pool, _pool_pid, _slots, _verified
+    with _lock:
+        if _pool_pid != os.getpid():
+            _pool, _pool_pid = None, os.getpid()
+            _slots = threading.BoundedSemaphore(PASSWORD_QUEUE_LIMIT)
+            _verified = OrderedDict()
+        if _pool is None and PASSWORD_WORKERS > 0 and not _pool_disabled:
+            try:
+                from concurrent.futures import ProcessPoolExecutor
+                import multiprocessing
+                # spawn: never fork a threaded web worker
+                _pool = ProcessPoolExecutor(PASSWORD_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError) as e:
+                _disable_pool(e)
+        return _pool
+
+
+def _disable_pool(error):
+    global _pool, _pool_disabled
+    log.warning('Password verification pool unavailable, verifying inline: %s', error)
+    _pool, _pool_disabled = None, True
+
+
+@atexit.register
+def _shutdown_pool():
+    # Before module teardown: the pool is imported lazily, so its finaliser may otherwise run last
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _drop_pool(pool):
+    # A worker died: the next submit() starts a fresh pool
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _credential_key(email, password, stored):
+    return hmac.new(_cache_key, '\0'.join((email, password, stored)).encode(), hashlib.sha256).digest()
+
+
+def _remember(key):
+    if LOGIN_CACHE_SIZE <= 0:
+        return
+    with _lock:
+        _verified[key] = time.monotonic() + LOGIN_CACHE_TTL
+        _verified.move_to_end(key)
+        while len(_verified) > LOGIN_CACHE_SIZE:
+            _verified.popitem(last=False)
+
+
+def _recently_verified(key):
+    with _lock:
+        expires = _verified.get(key)
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del _verified[key]
+            return False
+        return True
+
+
+def _placeholder_hash():
+    # Unknown users are checked against this so they cost the same as real ones
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(secrets.token_hex(16))
+    return _dummy_hash
+
+
+def submit(email, password, stored):
+    # Future of (ok, new hash or None); raises Overloaded when the queue is full
+    if stored is not None and _recently_verified(_credential_key(email, password, stored)):
+        done = Future()
+        done.set_result((True, None))
+        return done
+    pool = _executor()
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        REJECTED.inc('login', 'queue_full')
+        raise Overloaded()
+    check = stored if stored is not None else _placeholder_hash()
+    try:
+        if pool is None:
+            pending = _run_inline(password, check)
+        else:
+            try:
+                pending = pool.submit(verify, password, check)
+            except (futures.BrokenExecutor, RuntimeError):
+                _drop_pool(pool)
+                pending = _run_inline(password, check)
+            except OSError as e:
+                with _lock:
+                    _disable_pool(e)
+                pending = _run_inline(password, check)
+    except Exception:
+        slots.release()
+        raise
+    result = Future()
+
+    def finished(f):
+        try:
+            try:
+                ok, new_hash, seconds = f.result()
+            except futures.BrokenExecutor:  # BrokenProcessPool
+                _drop_pool(pool)
+                ok, new_hash, seconds = verify(password, check)
+        except Exception as e:
+            if result.set_running_or_notify_cancel():
+                result.set_exception(e)
+            return
+        finally:
+            slots.release()
+        PASSWORD_VERIFY_SECONDS.observe(seconds)
+        ok = ok and stored is not None
+        if ok:
+            _remember(_credential_key(email, password, new_hash or stored))
+        # False when the caller gave up and cancelled it (asyncio.wait_for timing out)
+        if result.set_running_or_notify_cancel():
+            result.set_result((ok, new_hash))
+
+    pending.add_done_callback(finished)
+    return result
+
+
+def _run_inline(password, stored):
+    done = Future()
+    try:
+        done.set_result(verify(password, stored))
+    except Exception as e:
+        done.set_exception(e)
+    return done
+
+
+def check_password(email, password, stored):
+    # Blocking form of submit(); a check that overruns PASSWORD_VERIFY_TIMEOUT counts as overload
+    try:
+        return submit(email, password, stored).result(timeout=PASSWORD_VERIFY_TIMEOUT)
+    except futures.TimeoutError:
+        REJECTED.inc('login', 'timeout')
+        raise Overloaded()
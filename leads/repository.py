@@ -0,0 +1,144 @@
+# Storage interface behind the shared lead routes (leads/routes.py).
+# Leads cross this boundary as API dicts (row_to_lead / doc_to_lead shape), except
+# list_leads pages, which are common.LEAD_COLUMNS tuples for the serialiser.
+from contextvars import ContextVar
+import threading
+import traceback
+
+# Who the current request acts for (the token subject), set by the routes, so a
+# backend can give that client read-your-writes across its requests
+current_client = ContextVar('lead_client', default=None)
+
+
+class ChangesExpired(Exception):
+    # Resume token older than the retained change history: the client has to reload
+    pass
+
+
+class LeadRepository:
+    name = 'base'
+    default_count_mode = 'exact'  # GET /api/leads ?count= when absent
+
+    def __init__(self):
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def init_schema(self):
+        # Create or migrate tables/indexes and seed defaults; returns a schema version or None
+        raise NotImplementedError
+
+    def init_db(self):
+        try:
+            version = self.init_schema()
+            if version is not None:
+                print(f"Database schema at version {version}")
+            return True
+        except Exception as e:
+            print(f"Database initialization error: {e}")
+            traceback.print_exc()
+            return False
+
+    def ensure_schema(self):
+        # Once per process, on first use rather than on import
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                self._schema_ready = self.init_db()
+
+    def parse_id(self, lead_id):
+        # Backend id from the URL/cursor string; ValueError if malformed
+        raise NotImplementedError
+
+    def get_password_hash(self, email):
+        # Stored credential (a hash, or plaintext from before hashing), None for unknown users
+        raise NotImplementedError
+
+    def set_password_hash(self, email, old, new):
+        # Replace the credential only if it still equals old (rehash after login)
+        raise NotImplementedError
+
+    def health(self):
+        # {'database', 'user_count', 'leads_count', 'test_user_exists'}
+        raise NotImplementedError
+
+    def list_leads(self, filters, count_mode, limit, offset=0, after_id=None):
+        # Newest first. Returns (rows, total or None, has_more); after_id switches to keyset mode,
+        # where the page starts right below after_id and callers pass offset=0
+        raise NotImplementedError
+
+    def lead_stats(self):
+        # {status: lead count} from maintained counters, never a scan of the leads
+        raise NotImplementedError
+
+    def reconcile_stats(self):
+        # Recounts leads per status and corrects the counters. Returns the drift that was
+        # fixed, {status: (counted, actual)}. Backends whose counts cannot drift keep this
+        return {}
+
+    def iter_leads(self, batch_size):
+        # Every lead, newest first, as lists of at most batch_size leads
+        raise NotImplementedError
+
+    def get_lead(self, lead_id):
+        raise NotImplementedError
+
+    def lead_version(self, lead_id):
+        # Current version, or None if the lead does not exist
+        raise NotImplementedError
+
+    def add_lead(self, lead):
+        # Validated lead fields in, stored lead (with id and version) out
+        raise NotImplementedError
+
+    def insert_leads(self, leads):
+        # One chunk of validated leads. Returns (inserted, [(index in chunk, error)])
+        raise NotImplementedError
+
+    def upsert_lead(self, lead, changes):
+        # Applies changes to the oldest lead sharing lead's normalised email, else its
+        # phone, or adds lead if there is none. Returns (stored lead, created)
+        raise NotImplementedError
+
+    def duplicate_keys(self, field, batch_size=1000):
+        # Normalised values of field ('email' or 'phone') shared by several leads, ascending
+        raise NotImplementedError
+
+    def merge_duplicates(self, field, keys):
+        # Merges each group of leads sharing one of keys into its oldest lead (see
+        # common.plan_merge), one short write per call. Returns (groups merged, leads removed)
+        raise NotImplementedError
+
+    def update_lead(self, lead_id, changes, version=None):
+        # Writes only the given fields and bumps version; None if missing or version differs
+        raise NotImplementedError
+
+    def delete_lead(self, lead_id):
+        # True if a lead was deleted
+        raise NotImplementedError
+
+    def apply_batch(self, ops):
+        # ops: [(op 'update' | 'delete', id, changes, version or None)], applied in order.
+        # Returns (status, version) per op: 200 updated, 204 deleted, 404, or 412 with
+        # the current version. Backends override this to write in one transaction.
+        results = []
+        for op, lead_id, changes, version in ops:
+            current = self.lead_version(lead_id)
+            if current is None:
+                results.append((404, None))
+            elif version is not None and version != current:
+                results.append((412, current))
+            elif op == 'delete':
+                results.append((204, None) if self.delete_lead(lead_id) else (404, None))
+            else:
+                updated = self.update_lead(lead_id, changes, current)
+                results.append((200, updated['version']) if updated else (412, self.lead_version(lead_id)))
+        return results
+
+    def changes(self, after, limit):
+        # At most limit lead changes after resume token `after` (None: from now on), oldest
+        # first. Returns ([(token, {'op', 'id', 'lead'})], token to resume from). Raises
+        # ValueError for a malformed token, ChangesExpired for one past the retained
+        # history, NotImplementedError if the backend has no change feed. 'lead' is the
+        # lead as it is now (None once deleted), so clients compare versions.
+        raise NotImplementedError
@@ -0,0 +1,589 @@
+# Lead API routes shared by every Flask app; storage goes through a LeadRepository
+from collections import OrderedDict
+from functools import wraps
+import csv
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, g, jsonify, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from . import metrics, passwords, serialize
+from .auth import auth_cache_info, token_for, verify_token
+from .common import (MAX_PAGE_LIMIT, STATUSES, decode_cursor, encode_cursor, export_chunk, iter_bulk_rows, lead_changes,
+                     lead_filters, validate_lead)
+from .limits import Limiter
+from .repository import ChangesExpired, current_client
+
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', '1000'))
+BULK_MAX_ERRORS = int(os.environ.get('BULK_MAX_ERRORS', '1000'))
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '500'))
+BATCH_MAX_OPS = int(os.environ.get('BATCH_MAX_OPS', '1000'))
+# Off by default: each stream holds a worker thread for CHANGES_STREAM_SECONDS, which blocks a
+# sync (one thread) gunicorn worker and runs into serverless duration limits. The Procfile and
+# Dockerfile turn it on with gthread workers; without it (Vercel) the /leads page polls instead
+CHANGES_STREAM_ENABLED = os.environ.get('CHANGES_STREAM_ENABLED', '0') == '1'
+CHANGES_POLL_SECONDS = float(os.environ.get('CHANGES_POLL_SECONDS', '1'))
+CHANGES_STREAM_SECONDS = float(os.environ.get('CHANGES_STREAM_SECONDS', '30'))  # then the client reconnects
+CHANGES_MAX_STREAMS = int(os.environ.get('CHANGES_MAX_STREAMS', '4'))  # per process; each holds a thread
+CHANGES_BATCH = 500
+CHANGES_KEEPALIVE_SECONDS = 15
+STATS_RECONCILE_SECONDS = float(os.environ.get('STATS_RECONCILE_SECONDS', '300'))  # 0 disables the recount
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', '256'))  # 0 disables
+PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', '2'))
+COUNT_MODES = ('exact', 'estimated', 'none')
+BATCH_ERRORS = {404: 'Not found', 409: 'Conflict', 412: 'Precondition failed'}
+NEVER_MATCHES = 0  # If-Match version no lead has: versions start at 1
+
+log = logging.getLogger('leads')
+
+
+def require_auth(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        auth = request.headers.get('Authorization', '')
+        if not auth.startswith('Bearer '):
+            return jsonify({'error': 'Unauthorized'}), 401
+        token = auth.split(' ', 1)[1]
+        try:
+            g.claims = verify_token(token)
+        except Exception:
+            return jsonify({'error': 'Unauthorized'}), 401
+        current_client.set(g.claims.get('sub'))
+        limiter = g.get('limiter')
+        wait = limiter.retry_after('sub', g.claims.get('sub')) if limiter else 0
+        if wait:
+            return rejected(429, 'Too many requests', 'rate_limit_sub', wait)
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def rejected(status, message, reason, retry_after):
+    # Shed before doing any work: 429 (client over its rate) or 503 (server busy)
+    metrics.REJECTED.inc(request.url_rule.rule if request.url_rule else 'unmatched', reason)
+    resp = jsonify({'error': message})
+    resp.status_code = status
+    resp.headers['Retry-After'] = str(retry_after)
+    return resp
+
+
+def if_match_version():
+    # Version required by If-Match; None when absent or "*", ValueError if malformed. If-Match
+    # uses strong comparison (RFC 9110): a weak tag (W/"2") or one that is not a version is
+    # valid but matches no lead, which NEVER_MATCHES stands for
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    tags = if_match.as_set()
+    if not tags:
+        return NEVER_MATCHES
+    if len(tags) != 1:
+        raise ValueError('Invalid If-Match')
+    tag = next(iter(tags))
+    return int(tag) if tag.isdigit() else NEVER_MATCHES
+
+
+def lead_response(lead, status=200):
+    with metrics.SERIALIZE_SECONDS.time(request.url_rule.rule):
+        resp = jsonify(lead)
+    resp.status_code = status
+    resp.set_etag(str(lead['version']))
+    return resp
+
+
+class PageCache:
+    # Serialised GET /api/leads responses, LRU by query string. An entry is only
+    # served while the lead change counter is unchanged and it is younger than
+    # ttl. The counter only sees this process's writes, so ttl is what bounds
+    # staleness (and stale 304s) after writes in other worker processes.
+    def __init__(self, size=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.generation = 0
+        self.stats = {'hits': 0, 'misses': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        # Called after every committed lead write
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == self.generation and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[2], entry[3]
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, generation, etag, body):
+        if self.size <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return  # a write landed while this page was being read
+            self._entries[key] = (generation, time.monotonic() + self.ttl, body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, entries=len(self._entries),
+                        bytes=sum(len(entry[2]) for entry in self._entries.values()),
+                        hit_rate=self.stats['hits'] / lookups if lookups else None)
+
+
+def page_response(body, etag):
+    # 304 with no body when the client already holds this representation
+    if request.if_none_match.contains(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = current_app.response_class(body, mimetype='application/json')
+    resp.set_etag(etag)
+    return resp
+
+
+def leads_blueprint(repo, page_cache=None, limiter=None):
+    # /api/auth/login, /api/cache/stats and /api/leads* backed by repo
+    bp = Blueprint('leads', __name__)
+    cache = page_cache or PageCache()
+    limiter = limiter or Limiter()
+    bp.repo = repo
+    bp.page_cache = cache
+    bp.limiter = limiter
+    feed = threading.Condition()  # notified after local writes so change streams poll at once
+    streams = threading.BoundedSemaphore(CHANGES_MAX_STREAMS)
+    reconcile = {'due': time.monotonic() + STATS_RECONCILE_SECONDS, 'running': False}
+    reconcile_lock = threading.Lock()
+
+    @bp.record_once
+    def install_json_provider(state):
+        # orjson for every jsonify() in the app when it is installed (JSON_PROVIDER)
+        state.app.json = serialize.json_provider(state.app)
+
+    @bp.record_once
+    def trust_proxies(state):
+        # request.remote_addr is the client behind limiter.trusted_proxies proxies (TRUSTED_PROXIES)
+        if limiter.trusted_proxies > 0:
+            state.app.wsgi_app = ProxyFix(state.app.wsgi_app, x_for=limiter.trusted_proxies)
+
+    def parse_id(lead_id):
+        try:
+            return repo.parse_id(lead_id)
+        except ValueError:
+            return None
+
+    def wrote():
+        # After every committed lead write
+        cache.invalidate()
+        with feed:
+            feed.notify_all()
+
+    def reconcile_stats():
+        # Background recount of the status counters, one at a time per process
+        try:
+            drift = repo.reconcile_stats()
+            if drift:
+                log.warning('Lead status counters had drifted, corrected {status: (counted, actual)}: %s', drift)
+        except Exception:
+            log.exception('Lead status counter reconcile failed')
+        finally:
+            with reconcile_lock:
+                reconcile['running'] = False
+                reconcile['due'] = time.monotonic() + STATS_RECONCILE_SECONDS
+
+    def lead_write_failed(lead_id):
+        # Conditional write matched nothing: 404 if the lead is gone, else 412 with the current ETag
+        version = repo.lead_version(lead_id)
+        if version is None:
+            return jsonify({'error': 'Not found'}), 404
+        resp = jsonify({'error': 'Precondition failed'})
+        resp.status_code = 412
+        resp.set_etag(str(version))
+        return resp
+
+    @bp.before_app_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        metrics.start_request()
+        current_client.set(None)
+
+    @bp.before_app_request
+    def admit():
+        # Per-IP rate limits, then the route's in-flight cap; the per-subject limit is in require_auth
+        if not request.path.startswith('/api/'):
+            return None
+        g.limiter = limiter
+        wait = limiter.retry_after('ip', request.remote_addr)
+        if wait:
+            return rejected(429, 'Too many requests', 'rate_limit_ip', wait)
+        if request.endpoint == 'leads.login':
+            wait = limiter.retry_after('login', request.remote_addr)
+            if wait:
+                return rejected(429, 'Too many login attempts', 'rate_limit_login', wait)
+        slots = limiter.slots(request.endpoint)
+        if slots is not None:
+            if not slots.acquire(blocking=False):
+                return rejected(503, 'Server busy, retry shortly', 'inflight', 1)
+            g.inflight = slots
+        return None
+
+    @bp.teardown_app_request
+    def release_slot(exc):
+        slots = g.pop('inflight', None)
+        if slots is not None:
+            slots.release()
+
+    @bp.after_app_request
+    def record_request(resp):
+        # Per-route latency histogram, and a log line with the DB calls for slow requests
+        if resp.is_streamed and 'inflight' in g:
+            # Streamed bodies (export) hold their slot until the body is sent
+            resp.call_on_close(g.pop('inflight').release)
+        start = g.pop('request_start', None)
+        if start is None:
+            return resp
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_SECONDS.observe(elapsed, request.method, route, str(resp.status_code))
+        if metrics.SLOW_REQUEST_MS and elapsed * 1000 >= metrics.SLOW_REQUEST_MS:
+            operations = '; '.join(f'{op} {seconds * 1000:.1f} ms: {statement}'
+                                   for op, statement, seconds in metrics.request_operations())
+            log.warning('Slow request %s %s -> %s in %.1f ms [%s]', request.method, request.full_path.rstrip('?'),
+                        resp.status_code, elapsed * 1000, operations or 'no DB calls')
+        return resp
+
+    @bp.errorhandler(Exception)
+    def internal_error(e):
+        if isinstance(e, HTTPException):
+            return e
+        log.exception('%s %s failed', request.method, request.path)
+        return jsonify({'error': 'Internal server error'}), 500
+
+    @bp.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        if not metrics.METRICS_ENABLED:
+            return jsonify({'error': 'Not found'}), 404
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    @bp.route('/api/auth/login', methods=['POST'])
+    def login():
+        data = request.get_json(silent=True) or {}
+        email = (data.get('email') or '').strip().lower()
+        password = data.get('password') or ''
+        stored = repo.get_password_hash(email)
+        start = time.perf_counter()
+        try:
+            ok, new_hash = passwords.check_password(email, password, stored)
+        except passwords.Overloaded:
+            resp = jsonify({'error': 'Login temporarily unavailable, retry shortly'})
+            resp.status_code = 503
+            resp.headers['Retry-After'] = '1'
+            return resp
+        finally:
+            metrics.record_operation('password', passwords.PASSWORD_HASH_METHOD, time.perf_counter() - start)
+        if not ok:
+            return jsonify({'error': 'Invalid credentials'}), 401
+        if new_hash:
+            repo.set_password_hash(email, stored, new_hash)
+        return jsonify({'token': token_for(email)})
+
+    @bp.route('/api/cache/stats', methods=['GET'])
+    @require_auth
+    def cache_stats():
+        return jsonify({
+            'page_cache': cache.info(),
+            'auth_cache': auth_cache_info()
+        })
+
+    @bp.route('/api/leads', methods=['GET'])
+    @require_auth
+    def get_leads():
+        key = tuple(sorted(request.args.items(multi=True)))
+        cached = cache.get(key)
+        if cached:
+            return page_response(*cached)
+        generation = cache.generation
+        try:
+            page = int(request.args.get('page', 1))
+            limit = int(request.args.get('limit', 5))
+        except Exception:
+            page, limit = 1, 5
+        if page < 1:
+            page = 1
+        if limit < 1:
+            limit = 5
+        limit = min(limit, MAX_PAGE_LIMIT)
+        count_mode = request.args.get('count', repo.default_count_mode)
+        if count_mode not in COUNT_MODES:
+            count_mode = repo.default_count_mode
+        # Keyset mode: ?cursor=<next_cursor> or ?after_id=<id>
+        cursor_arg = request.args.get('cursor')
+        after_id = request.args.get('after_id')
+        keyset = bool(cursor_arg or after_id)
+        if keyset:
+            try:
+                after_id = repo.parse_id(decode_cursor(cursor_arg) if cursor_arg else after_id)
+            except Exception:
+                return jsonify({'error': 'Invalid cursor'}), 400
+        else:
+            after_id = None
+        try:
+            filters = lead_filters(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # ?page= only applies to offset mode; a cursor already marks where the page starts
+        offset = 0 if keyset else (page - 1) * limit
+        rows, total, has_more = repo.list_leads(filters, count_mode, limit, offset, after_id)
+        pages = (total + limit - 1) // limit if total is not None else None
+        next_cursor = encode_cursor(rows[-1][0]) if has_more else None
+        meta = {'limit': limit, 'total': total, 'pages': pages, 'next_cursor': next_cursor}
+        if not keyset:
+            meta['page'] = page
+        with metrics.SERIALIZE_SECONDS.time(request.url_rule.rule):
+            body = serialize.page_body(rows, meta)
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        cache.put(key, generation, etag, body)
+        return page_response(body, etag)
+
+    @bp.route('/api/leads/stats', methods=['GET'])
+    @require_auth
+    def lead_stats():
+        # Counts per status from maintained counters: constant cost at any table size
+        if STATS_RECONCILE_SECONDS > 0:
+            with reconcile_lock:
+                start = not reconcile['running'] and time.monotonic() >= reconcile['due']
+                reconcile['running'] = reconcile['running'] or start
+            if start:
+                threading.Thread(target=reconcile_stats, name='leads-reconcile', daemon=True).start()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(repo.lead_stats())
+        return jsonify({'total': sum(counts.values()), 'by_status': counts})
+
+    @bp.route('/api/leads', methods=['POST'])
+    @require_auth
+    def add_lead():
+        data = request.get_json(silent=True) or {}
+        lead = validate_lead(data)
+        if lead is None:
+            return jsonify({'error': 'Bad request'}), 400
+        if request.args.get('upsert') in ('1', 'true'):
+            # An existing lead with the same normalised email (else phone) gets the supplied fields: 200
+            stored, created = repo.upsert_lead(lead, lead_changes(data))
+            wrote()
+            return lead_response(stored, 201 if created else 200)
+        created = repo.add_lead(lead)
+        wrote()
+        return lead_response(created, 201)
+
+    @bp.route('/api/leads/bulk', methods=['POST'])
+    @require_auth
+    def bulk_add_leads():
+        fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+        if fmt not in ('ndjson', 'csv'):
+            return jsonify({'error': 'Bad request'}), 400
+        inserted, failed, errors = 0, 0, []
+
+        def flush(chunk, lines):
+            nonlocal inserted, failed
+            count, write_errors = repo.insert_leads(chunk)
+            wrote()
+            inserted += count
+            for index, message in write_errors:
+                failed += 1
+                if len(errors) < BULK_MAX_ERRORS:
+                    errors.append({'line': lines[index], 'error': message})
+
+        # Stream the body, writing every BULK_CHUNK_SIZE valid rows
+        chunk, lines = [], []
+        try:
+            for line_no, row, error in iter_bulk_rows(request.stream, fmt):
+                lead = validate_lead(row)
+                if lead is None:
+                    failed += 1
+                    if len(errors) < BULK_MAX_ERRORS:
+                        errors.append({'line': line_no, 'error': error or 'Bad request'})
+                    continue
+                chunk.append(lead)
+                lines.append(line_no)
+                if len(chunk) >= BULK_CHUNK_SIZE:
+                    flush(chunk, lines)
+                    chunk, lines = [], []
+            if chunk:
+                flush(chunk, lines)
+        except (UnicodeDecodeError, csv.Error) as e:
+            return jsonify({'error': f'Malformed upload: {e}', 'inserted': inserted, 'failed': failed, 'errors': errors}), 400
+        except Exception:
+            log.exception('Bulk add leads failed after %d rows', inserted)
+            return jsonify({'error': 'Internal server error', 'inserted': inserted}), 500
+        return jsonify({'inserted': inserted, 'failed': failed, 'errors': errors})
+
+    @bp.route('/api/leads/export', methods=['GET'])
+    @require_auth
+    def export_leads():
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in ('ndjson', 'csv'):
+            return jsonify({'error': 'Bad request'}), 400
+        try:
+            batch_size = max(1, int(request.args.get('batch_size', EXPORT_BATCH_SIZE)))
+        except ValueError:
+            batch_size = EXPORT_BATCH_SIZE
+
+        def generate():
+            if fmt == 'csv':
+                yield 'id,name,email,phone,status\r\n'
+            for batch in repo.iter_leads(batch_size):
+                yield export_chunk(batch, fmt)
+
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        return Response(generate(), mimetype=mimetype,
+                        headers={'Content-Disposition': f'attachment; filename=leads.{fmt}'})
+
+    @bp.route('/api/leads/batch', methods=['POST'])
+    @require_auth
+    def batch_leads():
+        # {"operations": [{"op": "update" | "delete", "id", "fields", "version"}]} (or the bare
+        # list), applied in order in one transaction; invalid items are reported, not run
+        data = request.get_json(silent=True)
+        items = data.get('operations') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'Bad request'}), 400
+        if len(items) > BATCH_MAX_OPS:
+            return jsonify({'error': f'At most {BATCH_MAX_OPS} operations per batch'}), 413
+        results, ops, positions = [], [], []
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            result = {'index': index, 'id': item.get('id')}
+            results.append(result)
+            op, version = item.get('op'), item.get('version')
+            lead_id = parse_id(str(item.get('id')))
+            changes = lead_changes(item.get('fields') or {}) if op == 'update' else {}
+            if op not in ('update', 'delete') or (op == 'update' and not changes):
+                result.update(status=400, error='Bad request')
+            elif lead_id is None:
+                result.update(status=400, error='Invalid lead ID')
+            elif version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+                result.update(status=400, error='Invalid version')
+            else:
+                ops.append((op, lead_id, changes, version))
+                positions.append(index)
+        applied = 0
+        if ops:
+            for index, (status, version) in zip(positions, repo.apply_batch(ops)):
+                results[index]['status'] = status
+                if status in (200, 204):
+                    applied += 1
+                else:
+                    results[index]['error'] = BATCH_ERRORS[status]
+                if version is not None:
+                    results[index]['version'] = version
+            if applied:
+                wrote()
+        return jsonify({'applied': applied, 'failed': len(items) - applied, 'results': results})
+
+    @bp.route('/api/leads/changes', methods=['GET'])
+    @require_auth
+    def lead_change_stream():
+        # Server-sent events: "lead" per change ({op, id, lead}), each with an id that
+        # resumes the feed via Last-Event-ID (EventSource reconnects) or ?since=; "ready"
+        # carries the current position; "reset" means the position is gone, reload
+        if not CHANGES_STREAM_ENABLED:
+            return jsonify({'error': 'Change feed is turned off (CHANGES_STREAM_ENABLED)'}), 501
+        since = request.headers.get('Last-Event-ID') or request.args.get('since') or None
+        try:
+            events, token = repo.changes(since, CHANGES_BATCH)
+        except NotImplementedError:
+            return jsonify({'error': 'Change feed not available for this backend'}), 501
+        except ValueError:
+            return jsonify({'error': 'Invalid resume token'}), 400
+        except ChangesExpired:
+            return Response('event: reset\ndata: {}\n\n', mimetype='text/event-stream')
+        if not streams.acquire(blocking=False):
+            return rejected(503, 'Too many change streams, retry shortly', 'streams_full', 5)
+        dumps = current_app.json.dumps
+
+        def generate(events, token):
+            yield f'retry: 2000\nid: {since or token}\nevent: ready\ndata: {{}}\n\n'
+            deadline = time.monotonic() + CHANGES_STREAM_SECONDS
+            quiet_since = time.monotonic()
+            while True:
+                if events:
+                    yield ''.join(f'id: {event_token}\nevent: lead\ndata: {dumps(event)}\n\n'
+                                  for event_token, event in events)
+                    quiet_since = time.monotonic()
+                elif time.monotonic() - quiet_since >= CHANGES_KEEPALIVE_SECONDS:
+                    yield ': keepalive\n\n'
+                    quiet_since = time.monotonic()
+                if time.monotonic() >= deadline:
+                    return
+                if len(events) < CHANGES_BATCH:
+                    with feed:
+                        feed.wait(CHANGES_POLL_SECONDS)
+                try:
+                    events, token = repo.changes(token, CHANGES_BATCH)
+                except ChangesExpired:
+                    yield 'event: reset\ndata: {}\n\n'
+                    return
+
+        resp = Response(generate(events, token), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        resp.call_on_close(streams.release)
+        return resp
+
+    def write_lead(lead_id, partial):
+        lead_id = parse_id(lead_id)
+        if lead_id is None:
+            return jsonify({'error': 'Invalid lead ID'}), 400
+        try:
+            version = if_match_version()
+        except ValueError:
+            return jsonify({'error': 'Invalid If-Match'}), 400
+        if version == NEVER_MATCHES:
+            return lead_write_failed(lead_id)
+        changes = lead_changes(request.get_json(silent=True) or {})
+        if changes is None or (partial and not changes):
+            return jsonify({'error': 'Bad request'}), 400
+        if changes:
+            updated = repo.update_lead(lead_id, changes, version)
+            if updated:
+                wrote()
+        else:
+            updated = repo.get_lead(lead_id)
+        if not updated:
+            return lead_write_failed(lead_id)
+        return lead_response(updated)
+
+    @bp.route('/api/leads/<lead_id>', methods=['PUT'])
+    @require_auth
+    def update_lead(lead_id):
+        return write_lead(lead_id, partial=False)
+
+    @bp.route('/api/leads/<lead_id>', methods=['PATCH'])
+    @require_auth
+    def patch_lead(lead_id):
+        # Only the supplied fields; at least one is required
+        return write_lead(lead_id, partial=True)
+
+    @bp.route('/api/leads/<lead_id>', methods=['DELETE'])
+    @require_auth
+    def delete_lead(lead_id):
+        lead_id = parse_id(lead_id)
+        if lead_id is None:
+            return jsonify({'error': 'Invalid lead ID'}), 400
+        if not repo.delete_lead(lead_id):
+            return jsonify({'error': 'Not found'}), 404
+        wrote()
+        return '', 204
+
+    return bp
@@ -0,0 +1,222 @@
+# SQLite schema for the leads API: forward-only migrations tracked in schema_migrations
+from datetime import datetime
+import sqlite3
+
+from .common import normalize_email, normalize_phone
+
+
+def _seed_defaults(cursor):
+    # Test user and sample leads for a fresh database
+    cursor.execute('SELECT 1 FROM users WHERE email = ?', ('test@example.com',))
+    if not cursor.fetchone():
+        cursor.execute('INSERT INTO users (email, password) VALUES (?, ?)',
+                       ('test@example.com', 'password123'))
+    cursor.execute('SELECT 1 FROM leads LIMIT 1')
+    if not cursor.fetchone():
+        cursor.executemany('INSERT INTO leads (name, email, phone, status) VALUES (?, ?, ?, ?)', [
+            ('Alice', 'alice@example.com', '1234567890', 'New'),
+            ('Bob', 'bob@example.com', '9876543210', 'In Progress'),
+        ])
+
+
+def _create_lead_search(cursor):
+    # Indexes behind ?status= and ?email=, and an FTS5 index for ?q= prefix search
+    cursor.execute('CREATE INDEX IF NOT EXISTS leads_status_id ON leads (status, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS leads_email ON leads (email)')
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE leads_fts USING fts5(name, email, phone, content='leads', content_rowid='id')")
+    except sqlite3.OperationalError as e:
+        print(f"FTS5 unavailable, search falls back to LIKE: {e}")
+        return
+    cursor.execute("INSERT INTO leads_fts (leads_fts) VALUES ('rebuild')")
+    cursor.execute('''
+        CREATE TRIGGER leads_fts_insert AFTER INSERT ON leads
+        BEGIN
+            INSERT INTO leads_fts (rowid, name, email, phone) VALUES (new.id, new.name, new.email, new.phone);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER leads_fts_delete AFTER DELETE ON leads
+        BEGIN
+            INSERT INTO leads_fts (leads_fts, rowid, name, email, phone)
+            VALUES ('delete', old.id, old.name, old.email, old.phone);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER leads_fts_update AFTER UPDATE OF name, email, phone ON leads
+        BEGIN
+            INSERT INTO leads_fts (leads_fts, rowid, name, email, phone)
+            VALUES ('delete', old.id, old.name, old.email, old.phone);
+            INSERT INTO leads_fts (rowid, name, email, phone) VALUES (new.id, new.name, new.email, new.phone);
+        END
+    ''')
+
+
+def _add_dedupe_keys(cursor):
+    # Normalised email/phone columns (written by the repository, see common.with_dedupe_keys),
+    # backfilled here with the same Python normalisers, and their indexes for upsert lookups
+    cursor.execute('ALTER TABLE leads ADD COLUMN email_norm TEXT')
+    cursor.execute('ALTER TABLE leads ADD COLUMN phone_norm TEXT')
+    conn = cursor.connection
+    conn.create_function('lead_email_norm', 1, normalize_email, deterministic=True)
+    conn.create_function('lead_phone_norm', 1, normalize_phone, deterministic=True)
+    # The change log only follows API-visible columns, so the backfill is not replayed as updates
+    cursor.execute('DROP TRIGGER IF EXISTS lead_changes_update')
+    cursor.execute('UPDATE leads SET email_norm = lead_email_norm(email), phone_norm = lead_phone_norm(phone)')
+    cursor.execute('''
+        CREATE TRIGGER lead_changes_update AFTER UPDATE OF name, email, phone, status, version ON leads
+        BEGIN
+            INSERT INTO lead_changes (lead_id, op) VALUES (new.id, 'update');
+        END
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS leads_email_norm ON leads (email_norm, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS leads_phone_norm ON leads (phone_norm, id)')
+
+
+# Forward-only schema migrations. Append new steps; never edit applied ones.
+# Each step is a list of SQL statements or a callable taking a cursor.
+MIGRATIONS = [
+    # 1: base tables
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS leads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            status TEXT DEFAULT 'New'
+        )
+        ''',
+    ],
+    # 2: lead count maintained by triggers, so listing never needs COUNT(*)
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        "INSERT OR IGNORE INTO counters (name, value) SELECT 'leads', COUNT(*) FROM leads",
+        '''
+        CREATE TRIGGER IF NOT EXISTS leads_count_insert AFTER INSERT ON leads
+        BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'leads';
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS leads_count_delete AFTER DELETE ON leads
+        BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'leads';
+        END
+        ''',
+    ],
+    # 3: default data
+    _seed_defaults,
+    # 4: filter indexes and full-text search
+    _create_lead_search,
+    # 5: per-row version for If-Match optimistic concurrency
+    [
+        'ALTER TABLE leads ADD COLUMN version INTEGER NOT NULL DEFAULT 1',
+    ],
+    # 6: change log behind GET /api/leads/changes. Triggers append to it, so every
+    # write path (single, bulk, batch, other processes) is covered; every 1000th
+    # entry trims it to the last 100000
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS lead_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            lead_id INTEGER NOT NULL,
+            op TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS lead_changes_insert AFTER INSERT ON leads
+        BEGIN
+            INSERT INTO lead_changes (lead_id, op) VALUES (new.id, 'insert');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS lead_changes_update AFTER UPDATE ON leads
+        BEGIN
+            INSERT INTO lead_changes (lead_id, op) VALUES (new.id, 'update');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS lead_changes_delete AFTER DELETE ON leads
+        BEGIN
+            INSERT INTO lead_changes (lead_id, op) VALUES (old.id, 'delete');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS lead_changes_trim AFTER INSERT ON lead_changes WHEN new.seq % 1000 = 0
+        BEGIN
+            DELETE FROM lead_changes WHERE seq <= new.seq - 100000;
+        END
+        ''',
+    ],
+    # 7: dedupe keys behind POST /api/leads?upsert=true and the dedupe job
+    _add_dedupe_keys,
+    # 8: per-status lead counts ('status:<status>' counters) behind GET /api/leads/stats,
+    # kept by triggers in the writing transaction
+    [
+        "INSERT OR REPLACE INTO counters (name, value) SELECT 'status:' || status, COUNT(*) FROM leads GROUP BY status",
+        '''
+        CREATE TRIGGER IF NOT EXISTS leads_status_count_insert AFTER INSERT ON leads
+        BEGIN
+            INSERT INTO counters (name, value) VALUES ('status:' || new.status, 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS leads_status_count_delete AFTER DELETE ON leads
+        BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'status:' || old.status;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS leads_status_count_update AFTER UPDATE OF status ON leads
+        WHEN old.status IS NOT new.status
+        BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'status:' || old.status;
+            INSERT INTO counters (name, value) VALUES ('status:' || new.status, 1)
+            ON CONFLICT (name) DO UPDATE SET value = value + 1;
+        END
+        ''',
+    ],
+]
+
+
+def migrate(conn):
+    # BEGIN IMMEDIATE serialises concurrent workers migrating the same file
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                applied_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations')
+        current = cursor.fetchone()[0]
+        for version, step in enumerate(MIGRATIONS[current:], start=current + 1):
+            if callable(step):
+                step(cursor)
+            else:
+                for statement in step:
+                    cursor.execute(statement)
+            cursor.execute('INSERT INTO schema_migrations (version, applied_at) VALUES (?, ?)',
+                           (version, datetime.utcnow().isoformat()))
+            print(f"Applied schema migration {version}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(MIGRATIONS)
@@ -0,0 +1,81 @@
+# JSON encoding for lead responses. orjson is used when installed (JSON_PROVIDER=auto
+# or orjson); otherwise pages are assembled from the row tuples with the stdlib's C
+# string quoting, which produces the same bytes as Flask's default jsonify.
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii
+import dataclasses
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')  # auto | orjson | stdlib
+USE_ORJSON = orjson is not None and JSON_PROVIDER in ('auto', 'orjson')
+if JSON_PROVIDER == 'orjson' and orjson is None:
+    raise RuntimeError('JSON_PROVIDER=orjson but orjson is not installed')
+
+_LEAD_TEMPLATE = '{"email":%s,"id":"%s","name":%s,"phone":%s,"status":%s,"version":%d}'
+
+
+def _default(obj):
+    # What Flask's default provider handles beyond orjson's native types
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(JSONProvider):
+    # Sorted keys and a trailing newline, like the default provider's output
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=_default, option=self.option) + b'\n',
+                                        mimetype='application/json')
+
+
+def json_provider(app):
+    return OrjsonProvider(app) if USE_ORJSON else DefaultJSONProvider(app)
+
+
+def page_body(rows, meta):
+    # GET /api/leads body as bytes: {"leads": [...], **meta} with sorted keys. rows are
+    # common.LEAD_COLUMNS tuples; the lead dicts are built here, or not at all.
+    if USE_ORJSON:
+        leads = [{'id': str(r[0]), 'name': r[1], 'email': r[2], 'phone': r[3], 'status': r[4], 'version': r[5]}
+                 for r in rows]
+        return orjson.dumps(dict(meta, leads=leads), default=_default, option=OrjsonProvider.option) + b'\n'
+    # Each row is formatted straight into the array. Every meta key sorts after
+    # "leads", so splicing keeps the output identical to jsonify's.
+    q = encode_basestring_ascii
+    try:
+        leads = ','.join(_LEAD_TEMPLATE % (q(email), lead_id, q(name), q(phone), q(status), version)
+                         for lead_id, name, email, phone, status, version in rows)
+    except TypeError:
+        # A NULL or non-string column: take the general path
+        leads = ','.join(json.dumps({'id': str(r[0]), 'name': r[1], 'email': r[2], 'phone': r[3], 'status': r[4],
+                                     'version': r[5]}, sort_keys=True, separators=(',', ':')) for r in rows)
+    rest = json.dumps(meta, sort_keys=True, separators=(',', ':'))
+    return ('{"leads":[' + leads + ']' + (',' + rest[1:] if meta else '}') + '\n').encode()
+
+
+def ndjson_lines(leads):
+    # NDJSON export lines for a batch of lead dicts
+    if USE_ORJSON:
+        return b''.join(orjson.dumps(lead) + b'\n' for lead in leads).decode()
+    return ''.join(json.dumps(lead) + '\n' for lead in leads)
@@ -0,0 +1,558 @@
+# SQLite lead repository: per-process connection pool with tuned PRAGMAs, and a
+# writer thread per process that groups concurrent writes into one commit
+from contextlib import contextmanager
+import contextvars
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from .common import DEDUPE_FIELDS, LEAD_COLUMNS, plan_batch, plan_merge, row_to_lead, with_dedupe_keys
+from .metrics import DB_CONNECT_SECONDS, db_operation
+from .repository import ChangesExpired, LeadRepository
+from .schema import migrate
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Database file shared by every worker; /tmp is the only writable path on Vercel
+DB_PATH = os.environ.get('DB_PATH') or (
+    '/tmp/app.db' if os.environ.get('VERCEL') else os.path.join(ROOT, 'instance', 'app.db'))
+# Connection pool: idle connections kept per worker process (0 disables pooling)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+DB_STATEMENT_CACHE = int(os.environ.get('DB_STATEMENT_CACHE', '256'))
+BATCH_READ_CHUNK = 500  # ids per IN (...) when reading versions for a batch
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    ('cache_size', os.environ.get('SQLITE_CACHE_SIZE', '-16000')),  # negative = KiB
+    ('busy_timeout', os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')),  # ms
+    # Checkpoint once the WAL reaches this many pages; truncate it back to this many bytes
+    ('wal_autocheckpoint', os.environ.get('SQLITE_WAL_AUTOCHECKPOINT', '1000')),
+    ('journal_size_limit', os.environ.get('SQLITE_JOURNAL_SIZE_LIMIT', str(64 * 1024 * 1024))),
+)
+# Writes go through one thread per process that commits up to SQLITE_WRITE_BATCH
+# of them together (0 = each request commits on its own connection)
+SQLITE_WRITE_QUEUE = os.environ.get('SQLITE_WRITE_QUEUE', '1') != '0'
+SQLITE_WRITE_BATCH = int(os.environ.get('SQLITE_WRITE_BATCH', '64'))
+SQLITE_WRITE_TIMEOUT = float(os.environ.get('SQLITE_WRITE_TIMEOUT', '30'))  # seconds a caller waits for its write
+# Idle seconds after a write before the writer runs a passive checkpoint (0 = only automatic ones)
+SQLITE_IDLE_CHECKPOINT = float(os.environ.get('SQLITE_IDLE_CHECKPOINT', '1'))
+
+log = logging.getLogger('leads')
+
+
+class PooledConnection(sqlite3.Connection):
+    # close() hands the connection back to its repository's pool instead of closing the file
+    def close(self):
+        try:
+            self.rollback()
+        except sqlite3.Error:
+            super().close()
+            return
+        if not self.repo.release(self):
+            super().close()
+
+    def discard(self):
+        super().close()
+
+
+class WriteQueue:
+    # Single writer for one process. Callers block until their write is committed.
+    # Each job runs in its own savepoint of the shared transaction, so a failing
+    # write rolls back alone and its caller gets the exception; a failed commit
+    # fails every job in the group. If the thread itself dies (say the file cannot
+    # be opened), queued and later jobs get that error and the repository starts
+    # a new writer on its next write.
+    def __init__(self, repo, batch=SQLITE_WRITE_BATCH, idle_checkpoint=SQLITE_IDLE_CHECKPOINT,
+                 timeout=SQLITE_WRITE_TIMEOUT):
+        self.repo = repo
+        self.path = repo.path
+        self.pid = os.getpid()  # a forked worker never inherits the thread
+        self.batch = batch
+        self.idle_checkpoint = idle_checkpoint
+        self.timeout = timeout
+        self.error = None  # what stopped the thread, if it died
+        self._jobs = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn):
+        # fn(conn) runs in the writer thread, in the caller's context so its
+        # statements still show up in the request's DB operations
+        job = [contextvars.copy_context(), fn, threading.Event(), None, None, False]
+        self._jobs.put(job)
+        # After the put: either the dying thread's drain fails this job, or error is already set
+        if self.error is not None and not job[2].is_set():
+            raise self.error
+        if not job[2].wait(self.timeout):
+            job[5] = True  # skipped if it has not started; one already running may still commit
+            raise TimeoutError(f'SQLite write not done after {self.timeout:g}s')
+        if job[4] is not None:
+            raise job[4]
+        return job[3]
+
+    def stop(self):
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        try:
+            conn = self.repo._connect()
+        except Exception as e:
+            self._fail(e)
+            return
+        try:
+            self._serve(conn)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            conn.discard()
+
+    def _fail(self, error):
+        log.error('SQLite writer stopped: %s', error, exc_info=error)
+        self.error = error
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                job[4] = error
+                job[2].set()
+
+    def _serve(self, conn):
+        dirty = False
+        while True:
+            try:
+                job = self._jobs.get(timeout=self.idle_checkpoint if dirty and self.idle_checkpoint > 0 else None)
+            except queue.Empty:
+                self._checkpoint(conn)
+                dirty = False
+                continue
+            if job is None:
+                return
+            jobs = [job]
+            while len(jobs) < self.batch:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    self._commit(conn, jobs)
+                    return
+                jobs.append(job)
+            self._commit(conn, jobs)
+            dirty = True
+
+    def _commit(self, conn, jobs):
+        try:
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                for job in jobs:
+                    if job[5]:
+                        continue  # its caller already gave up
+                    conn.execute('SAVEPOINT job')
+                    try:
+                        job[3] = job[0].run(job[1], conn)
+                    except Exception as e:
+                        job[4] = e
+                        conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                with db_operation(self.repo.name, 'commit', 'COMMIT'):
+                    conn.commit()
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+                for job in jobs:
+                    job[3] = None
+                    if job[4] is None:
+                        job[4] = e
+        finally:
+            for job in jobs:
+                job[2].set()
+
+    def _checkpoint(self, conn):
+        # Passive: copies what it can without waiting on readers, off the request path
+        try:
+            with db_operation(self.repo.name, 'checkpoint', 'PRAGMA wal_checkpoint(PASSIVE)'):
+                conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+        except sqlite3.Error as e:
+            log.warning('SQLite checkpoint failed: %s', e)
+
+
+_SELECT_ROWS = 'SELECT ' + ', '.join(LEAD_COLUMNS) + ' FROM leads'
+_STATUS_COUNTERS = "SELECT substr(name, 8), value FROM counters WHERE name LIKE 'status:%'"
+_RETURNING = ' RETURNING ' + ', '.join(LEAD_COLUMNS)
+_INSERT_LEAD = 'INSERT INTO leads (name, email, phone, status, email_norm, phone_norm) VALUES (?, ?, ?, ?, ?, ?)'
+_SELECT_CHANGES = ('SELECT c.seq, c.op, c.lead_id, ' + ', '.join('l.' + column for column in LEAD_COLUMNS)
+                   + ' FROM lead_changes c LEFT JOIN leads l ON l.id = c.lead_id WHERE c.seq > ? ORDER BY c.seq LIMIT ?')
+
+
+class SQLiteRepository(LeadRepository):
+    name = 'sqlite'
+
+    def __init__(self, path=DB_PATH, pool_size=DB_POOL_SIZE, write_queue=SQLITE_WRITE_QUEUE):
+        super().__init__()
+        self.path = path
+        self.pool_size = pool_size
+        self.write_queue = write_queue
+        self._pool = queue.LifoQueue()
+        self._pool_pid = os.getpid()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._fts_available = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE)
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        conn.repo = self
+        conn.db_path = self.path
+        conn.pid = os.getpid()
+        for name, value in SQLITE_PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def connect(self):
+        # Pooled connection; close() returns it
+        start = time.perf_counter()
+        if self._pool_pid != os.getpid():
+            # Forked worker: never reuse the parent's connections
+            self._pool, self._pool_pid = queue.LifoQueue(), os.getpid()
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                DB_CONNECT_SECONDS.observe(time.perf_counter() - start, self.name, 'new')
+                return conn
+            if conn.db_path == self.path:
+                DB_CONNECT_SECONDS.observe(time.perf_counter() - start, self.name, 'pool')
+                return conn
+            conn.discard()
+
+    def release(self, conn):
+        if conn.pid == os.getpid() and conn.db_path == self.path and self._pool.qsize() < self.pool_size:
+            self._pool.put(conn)
+            return True
+        return False
+
+    @contextmanager
+    def connection(self):
+        conn = self.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _submit(self, fn):
+        # Run fn(conn) in a write transaction and commit; returns what fn returns
+        if not self.write_queue:
+            with self.connection() as conn:
+                self._write(conn, 'BEGIN IMMEDIATE')
+                result = fn(conn)
+                with db_operation(self.name, 'commit', 'COMMIT'):
+                    conn.commit()
+            return result
+        writer = self._writer
+        if writer is None or writer.error is not None or writer.pid != os.getpid() or writer.path != self.path:
+            with self._writer_lock:
+                writer = self._writer
+                if (writer is None or writer.error is not None or writer.pid != os.getpid()
+                        or writer.path != self.path):
+                    if writer is not None and writer.pid == os.getpid():
+                        writer.stop()  # pointed at another file, or dead (then stop() returns at once)
+                    writer = self._writer = WriteQueue(self)
+        return writer.submit(fn)
+
+    def close(self):
+        # Stop this process's writer and close the pooled connections
+        with self._writer_lock:
+            if self._writer is not None and self._writer.pid == os.getpid():
+                self._writer.stop()
+            self._writer = None
+        while True:
+            try:
+                self._pool.get_nowait().discard()
+            except queue.Empty:
+                return
+
+    def init_schema(self):
+        self._fts_available = None
+        with self.connection() as conn:
+            return migrate(conn)
+
+    def parse_id(self, lead_id):
+        return int(lead_id)
+
+    def _fetch(self, cursor, operation, sql, params=(), one=False):
+        # Execute and fetch under the operation's timer
+        with db_operation(self.name, operation, sql):
+            cursor.execute(sql, params)
+            return cursor.fetchone() if one else cursor.fetchall()
+
+    def _write(self, conn, sql, params=(), many=False):
+        # Execute under the write timer, inside _submit's transaction; returns (cursor, first returned row)
+        with db_operation(self.name, 'write', sql):
+            cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+            row = None if many else cursor.fetchone()
+        return cursor, row
+
+    def get_password_hash(self, email):
+        with self.connection() as conn:
+            row = self._fetch(conn.cursor(), 'auth', 'SELECT password FROM users WHERE email = ?', (email,), one=True)
+        return row['password'] if row else None
+
+    def set_password_hash(self, email, old, new):
+        self._submit(lambda conn: self._write(conn, 'UPDATE users SET password = ? WHERE email = ? AND password = ?',
+                                              (new, email, old)))
+
+    def health(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM users')
+            user_count = cursor.fetchone()[0]
+            cursor.execute('SELECT COUNT(*) FROM leads')
+            leads_count = cursor.fetchone()[0]
+            cursor.execute('SELECT 1 FROM users WHERE email = ?', ('test@example.com',))
+            test_user = cursor.fetchone()
+        return {'database': 'SQLite connected', 'user_count': user_count, 'leads_count': leads_count,
+                'test_user_exists': test_user is not None}
+
+    def _where(self, cursor, filters):
+        clauses, params = [], []
+        if 'status' in filters:
+            clauses.append('status = ?')
+            params.append(filters['status'])
+        if 'email' in filters:
+            clauses.append('email = ?')
+            params.append(filters['email'])
+        terms = filters.get('terms')
+        if terms:
+            if self._fts_available is None:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'leads_fts'")
+                self._fts_available = cursor.fetchone() is not None
+            if self._fts_available:
+                clauses.append('id IN (SELECT rowid FROM leads_fts WHERE leads_fts MATCH ?)')
+                params.append(' '.join(f'"{term}"*' for term in terms))
+            else:
+                for term in terms:
+                    clauses.append('(name LIKE ? OR email LIKE ? OR phone LIKE ?)')
+                    params.extend([term + '%'] * 3)
+        return clauses, params
+
+    def _count(self, cursor, mode, clauses, params):
+        # Unfiltered: exact and estimated both read the trigger-maintained counter
+        if mode == 'none':
+            return None
+        if clauses:
+            return self._fetch(cursor, 'count', 'SELECT COUNT(*) FROM leads WHERE ' + ' AND '.join(clauses),
+                               params, one=True)[0]
+        row = self._fetch(cursor, 'count', "SELECT value FROM counters WHERE name = 'leads'", one=True)
+        if row is None:
+            row = self._fetch(cursor, 'count', 'SELECT COUNT(*) FROM leads', one=True)
+        return row[0]
+
+    def list_leads(self, filters, count_mode, limit, offset=0, after_id=None):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            clauses, params = self._where(cursor, filters)
+            total = self._count(cursor, count_mode, clauses, params)
+            # Fetch one extra row to know whether another page follows
+            if after_id is not None:
+                clauses, params = clauses + ['id < ?'], params + [after_id]
+            where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+            if after_id is not None:
+                rows = self._fetch(cursor, 'page', f'{_SELECT_ROWS}{where} ORDER BY id DESC LIMIT ?',
+                                   params + [limit + 1])
+            else:
+                rows = self._fetch(cursor, 'page', f'{_SELECT_ROWS}{where} ORDER BY id DESC LIMIT ? OFFSET ?',
+                                   params + [limit + 1, offset])
+        return rows[:limit], total, len(rows) > limit
+
+    def lead_stats(self):
+        with self.connection() as conn:
+            return dict(self._fetch(conn.cursor(), 'count', _STATUS_COUNTERS))
+
+    def reconcile_stats(self):
+        # One read transaction sees the counters and GROUP BY status at the same snapshot
+        # (triggers update both together); the difference then goes in as a short
+        # relative write, so the scan never holds the write lock
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
+            counted = dict(self._fetch(cursor, 'count', _STATUS_COUNTERS))
+            actual = dict(self._fetch(cursor, 'count', 'SELECT status, COUNT(*) FROM leads GROUP BY status'))
+            conn.rollback()
+        drift = {status: (counted.get(status, 0), actual.get(status, 0)) for status in counted.keys() | actual.keys()
+                 if counted.get(status, 0) != actual.get(status, 0)}
+        if drift:
+            self._submit(lambda conn: self._write(
+                conn, "INSERT INTO counters (name, value) VALUES ('status:' || ?, ?) "
+                      'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                [(status, have - was) for status, (was, have) in drift.items()], many=True))
+        return drift
+
+    def iter_leads(self, batch_size):
+        # One connection held for the whole stream; only batch_size rows in memory
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            with db_operation(self.name, 'export', _SELECT_ROWS + ' ORDER BY id DESC'):
+                cursor.execute(_SELECT_ROWS + ' ORDER BY id DESC')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [row_to_lead(row) for row in rows]
+
+    def get_lead(self, lead_id):
+        with self.connection() as conn:
+            row = self._fetch(conn.cursor(), 'read', _SELECT_ROWS + ' WHERE id = ?', (lead_id,), one=True)
+        return row_to_lead(row) if row else None
+
+    def lead_version(self, lead_id):
+        with self.connection() as conn:
+            row = self._fetch(conn.cursor(), 'read', 'SELECT version FROM leads WHERE id = ?', (lead_id,), one=True)
+        return row['version'] if row else None
+
+    @staticmethod
+    def _insert_params(lead):
+        keys = with_dedupe_keys({'email': lead['email'], 'phone': lead['phone']})
+        return lead['name'], lead['email'], lead['phone'], lead['status'], keys['email_norm'], keys['phone_norm']
+
+    @staticmethod
+    def _update_sql(lead_id, changes, version=None):
+        # One statement: only supplied columns (and their dedupe keys) are written, the row comes back via RETURNING
+        changes = with_dedupe_keys(dict(changes))
+        assignments = ''.join(f'{key} = ?, ' for key in changes) + 'version = version + 1'
+        sql = f'UPDATE leads SET {assignments} WHERE id = ?'
+        params = [*changes.values(), lead_id]
+        if version is not None:
+            sql += ' AND version = ?'
+            params.append(version)
+        return sql + _RETURNING, params
+
+    def add_lead(self, lead):
+        _, row = self._submit(lambda conn: self._write(conn, _INSERT_LEAD + _RETURNING, self._insert_params(lead)))
+        return row_to_lead(row)
+
+    def insert_leads(self, leads):
+        # One executemany and one commit per chunk
+        self._submit(lambda conn: self._write(conn, _INSERT_LEAD, [self._insert_params(lead) for lead in leads],
+                                              many=True))
+        return len(leads), []
+
+    def update_lead(self, lead_id, changes, version=None):
+        sql, params = self._update_sql(lead_id, changes, version)
+        _, row = self._submit(lambda conn: self._write(conn, sql, params))
+        return row_to_lead(row) if row else None
+
+    def upsert_lead(self, lead, changes):
+        return self._submit(lambda conn: self._upsert(conn, lead, changes))
+
+    def _upsert(self, conn, lead, changes):
+        # Lookup and write share the writer's transaction, so no other write lands in between
+        cursor = conn.cursor()
+        keys = with_dedupe_keys({'email': lead['email'], 'phone': lead['phone']})
+        for key in ('email_norm', 'phone_norm'):
+            if keys[key] is None:
+                continue
+            row = self._fetch(cursor, 'read', f'SELECT id FROM leads WHERE {key} = ? ORDER BY id LIMIT 1',
+                              (keys[key],), one=True)
+            if row is not None:
+                _, updated = self._write(conn, *self._update_sql(row['id'], changes))
+                return row_to_lead(updated), False
+        _, row = self._write(conn, _INSERT_LEAD + _RETURNING, self._insert_params(lead))
+        return row_to_lead(row), True
+
+    def duplicate_keys(self, field, batch_size=1000):
+        # Keyset pages over the dedupe index; no read stays open between pages
+        column = DEDUPE_FIELDS[field]
+        sql = (f'SELECT {column} FROM leads WHERE {column} > ? GROUP BY {column} HAVING COUNT(*) > 1 '
+               f'ORDER BY {column} LIMIT ?')
+        after = ''
+        while True:
+            with self.connection() as conn:
+                rows = self._fetch(conn.cursor(), 'dedupe', sql, (after, batch_size))
+            for row in rows:
+                yield row[0]
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0]
+
+    def merge_duplicates(self, field, keys):
+        return self._submit(lambda conn: self._merge(conn, DEDUPE_FIELDS[field], list(keys)))
+
+    def _merge(self, conn, column, keys):
+        groups = {}
+        for start in range(0, len(keys), BATCH_READ_CHUNK):
+            chunk = keys[start:start + BATCH_READ_CHUNK]
+            rows = self._fetch(conn.cursor(), 'dedupe', f'SELECT {column}, {", ".join(LEAD_COLUMNS)} FROM leads '
+                               f'WHERE {column} IN ({",".join("?" * len(chunk))}) ORDER BY id', chunk)
+            for row in rows:
+                groups.setdefault(row[0], []).append(tuple(row)[1:])
+        merged = removed = 0
+        for rows in groups.values():
+            if len(rows) < 2:
+                continue  # changed since the keys were read
+            survivor, changes, duplicates = plan_merge(rows)
+            if changes:
+                self._write(conn, *self._update_sql(survivor, changes))
+            self._write(conn, 'DELETE FROM leads WHERE id = ?', [(lead_id,) for lead_id in duplicates], many=True)
+            merged += 1
+            removed += len(duplicates)
+        return merged, removed
+
+    def delete_lead(self, lead_id):
+        cursor, _ = self._submit(lambda conn: self._write(conn, 'DELETE FROM leads WHERE id = ?', (lead_id,)))
+        return cursor.rowcount > 0
+
+    def apply_batch(self, ops):
+        return self._submit(lambda conn: self._apply_batch(conn, ops))
+
+    def _apply_batch(self, conn, ops):
+        # One write transaction: read the versions, replay the ops, then one
+        # executemany per distinct set of updated columns and one for the deletes
+        ids = list({lead_id for _, lead_id, _, _ in ops})
+        cursor = conn.cursor()
+        versions = {}
+        for start in range(0, len(ids), BATCH_READ_CHUNK):
+            chunk = ids[start:start + BATCH_READ_CHUNK]
+            rows = self._fetch(cursor, 'read', 'SELECT id, version FROM leads WHERE id IN (%s)'
+                               % ','.join('?' * len(chunk)), chunk)
+            versions.update((row['id'], row['version']) for row in rows)
+        results, updates, deleted = plan_batch(ops, versions)
+        groups = {}
+        for lead_id, (changes, bumps) in updates.items():
+            changes = with_dedupe_keys(changes)
+            groups.setdefault(tuple(changes), []).append((*changes.values(), bumps, lead_id))
+        for columns, params in groups.items():
+            assignments = ''.join(f'{column} = ?, ' for column in columns) + 'version = version + ?'
+            self._write(conn, f'UPDATE leads SET {assignments} WHERE id = ?', params, many=True)
+        if deleted:
+            self._write(conn, 'DELETE FROM leads WHERE id = ?', [(lead_id,) for lead_id in deleted], many=True)
+        return results
+
+    def changes(self, after, limit):
+        # Tokens are lead_changes.seq; AUTOINCREMENT never reuses one, so a gap before
+        # the oldest retained entry means the token fell out of the trimmed window
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            if after is None:
+                row = self._fetch(cursor, 'changes', "SELECT seq FROM sqlite_sequence WHERE name = 'lead_changes'",
+                                  one=True)
+                return [], str(row[0] if row else 0)
+            seq = int(after)
+            if seq < 0:
+                raise ValueError('Invalid resume token')
+            rows = self._fetch(cursor, 'changes', _SELECT_CHANGES, (seq, limit))
+            if rows and rows[0]['seq'] != seq + 1:
+                raise ChangesExpired()
+        events = [(str(row['seq']), {'op': row['op'], 'id': str(row['lead_id']),
+                                     'lead': row_to_lead(row) if row['id'] is not None else None})
+                  for row in rows]
+        return events, events[-1][0] if events else str(seq)
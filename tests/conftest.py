@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The leads package lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Module-level settings, read on import: passwords checked inline (no process pool to
+# spawn) and no admission control unless a test builds its own Limiter
+os.environ.setdefault('PASSWORD_WORKERS', '0')
+os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
@@ -0,0 +1,287 @@
+# The shared lead routes through Flask's test client, against the in-memory backend and a
+# temporary SQLite file; every test that takes `repo` runs on both and must agree
+import json
+import threading
+
+import pytest
+from flask import Flask
+
+from leads import passwords
+from leads.auth import token_for
+from leads.common import DEFAULT_USER
+from leads.limits import Limiter, MemoryBuckets
+from leads.memory import InMemoryRepository
+from leads.routes import leads_blueprint
+from leads.sqlite import SQLiteRepository
+
+AUTH = {'Authorization': 'Bearer ' + token_for(DEFAULT_USER['email'])}
+
+
+def make_client(repo, **kwargs):
+    app = Flask(__name__)
+    app.register_blueprint(leads_blueprint(repo, **kwargs))
+    return app.test_client()
+
+
+def sqlite_repo(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / 'leads.db'))
+    repo.init_schema()
+    return repo
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def repo(request, tmp_path):
+    if request.param == 'memory':
+        repo = InMemoryRepository()
+        repo.init_schema()
+    else:
+        repo = sqlite_repo(tmp_path)
+    yield repo
+    if request.param == 'sqlite':
+        repo.close()
+
+
+@pytest.fixture
+def client(repo):
+    return make_client(repo)
+
+
+def add(client, n, status='New'):
+    r = client.post('/api/leads', headers=AUTH, json={'name': f'Lead {n}', 'email': f'lead{n}@example.com',
+                                                      'phone': f'555-01{n:02}', 'status': status})
+    assert r.status_code == 201
+    return r.get_json()
+
+
+def ids(r):
+    assert r.status_code == 200, r.get_data(as_text=True)
+    return [lead['id'] for lead in r.get_json()['leads']]
+
+
+def test_keyset_cursor_walks_every_lead_once(client):
+    for n in range(7):
+        add(client, n)
+    everything = ids(client.get('/api/leads?limit=100', headers=AUTH))
+    r = client.get('/api/leads?limit=3', headers=AUTH)
+    seen = ids(r)
+    while r.get_json()['next_cursor']:
+        r = client.get(f"/api/leads?limit=3&cursor={r.get_json()['next_cursor']}", headers=AUTH)
+        assert 'page' not in r.get_json()
+        seen += ids(r)
+    assert seen == everything == sorted(everything, reverse=True)
+
+
+def test_keyset_ignores_page(client):
+    created = [add(client, n)['id'] for n in range(10)]
+    top = created[-1]
+    expected = ids(client.get(f'/api/leads?after_id={top}&limit=5', headers=AUTH))
+    assert expected == created[-2:-7:-1]
+    assert ids(client.get(f'/api/leads?after_id={top}&page=2&limit=5', headers=AUTH)) == expected
+
+
+def test_invalid_cursor_is_400(client):
+    assert client.get('/api/leads?after_id=nope', headers=AUTH).status_code == 400
+
+
+def test_if_match_version(client):
+    lead = add(client, 1)
+    url = f"/api/leads/{lead['id']}"
+    r = client.patch(url, headers={**AUTH, 'If-Match': '"1"'}, json={'status': 'Converted'})
+    assert r.status_code == 200 and r.headers['ETag'] == '"2"'
+    assert r.get_json()['status'] == 'Converted' and r.get_json()['name'] == 'Lead 1'
+    stale = client.patch(url, headers={**AUTH, 'If-Match': '"1"'}, json={'status': 'New'})
+    assert stale.status_code == 412 and stale.headers['ETag'] == '"2"'
+    assert client.put(url, headers={**AUTH, 'If-Match': '*'}, json={'name': 'Renamed'}).status_code == 200
+
+
+@pytest.mark.parametrize('tag', ['W/"1"', 'W/"2"', '"not-a-version"'])
+def test_if_match_that_cannot_match_is_412(client, tag):
+    # Strong comparison: weak tags are valid but never match
+    lead = add(client, 1)
+    r = client.patch(f"/api/leads/{lead['id']}", headers={**AUTH, 'If-Match': tag}, json={'status': 'Converted'})
+    assert r.status_code == 412 and r.headers['ETag'] == '"1"'
+    gone = client.patch('/api/leads/999999', headers={**AUTH, 'If-Match': tag}, json={'status': 'New'})
+    assert gone.status_code == 404
+
+
+def test_if_match_with_two_versions_is_400(client):
+    lead = add(client, 1)
+    r = client.patch(f"/api/leads/{lead['id']}", headers={**AUTH, 'If-Match': '"1", "2"'}, json={'status': 'New'})
+    assert r.status_code == 400
+
+
+def test_page_etag_and_304(client):
+    first = client.get('/api/leads?limit=5', headers=AUTH)
+    etag = first.headers['ETag']
+    again = client.get('/api/leads?limit=5', headers={**AUTH, 'If-None-Match': etag})
+    assert again.status_code == 304 and not again.data
+    add(client, 1)
+    changed = client.get('/api/leads?limit=5', headers={**AUTH, 'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    stats = client.get('/api/cache/stats', headers=AUTH).get_json()['page_cache']
+    assert stats['hits'] >= 1 and stats['entries'] >= 1
+
+
+def test_bulk_import_ndjson_and_csv(client):
+    before = client.get('/api/leads/stats', headers=AUTH).get_json()['total']
+    body = '\n'.join([json.dumps({'name': 'A', 'email': 'a@example.com', 'phone': '1'}),
+                      '{not json',
+                      json.dumps({'name': 'B', 'email': '', 'phone': '2'}),
+                      json.dumps({'name': 'C', 'email': 'c@example.com', 'phone': '3', 'status': 'Converted'})])
+    r = client.post('/api/leads/bulk', headers=AUTH, data=body, content_type='application/x-ndjson')
+    result = r.get_json()
+    assert (result['inserted'], result['failed']) == (2, 2)
+    assert [error['line'] for error in result['errors']] == [2, 3]
+    csv_body = 'name,email,phone,status\r\nD,d@example.com,4,New\r\nE,e@example.com,5,Bogus\r\n'
+    r = client.post('/api/leads/bulk', headers=AUTH, data=csv_body, content_type='text/csv')
+    assert (r.get_json()['inserted'], r.get_json()['failed']) == (1, 1)
+    assert client.get('/api/leads/stats', headers=AUTH).get_json()['total'] == before + 3
+
+
+def test_export_streams_every_lead(client):
+    for n in range(3):
+        add(client, n)
+    listed = ids(client.get('/api/leads?limit=100', headers=AUTH))
+    r = client.get('/api/leads/export?batch_size=2', headers=AUTH)
+    assert r.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['id'] for line in r.get_data(as_text=True).splitlines()] == listed
+    r = client.get('/api/leads/export?format=csv', headers=AUTH)
+    lines = r.get_data(as_text=True).splitlines()
+    assert lines[0] == 'id,name,email,phone,status' and len(lines) == len(listed) + 1
+
+
+def test_batch(client):
+    a, b = add(client, 1), add(client, 2)
+    r = client.post('/api/leads/batch', headers=AUTH, json={'operations': [
+        {'op': 'update', 'id': a['id'], 'fields': {'status': 'Converted'}, 'version': 1},
+        {'op': 'update', 'id': a['id'], 'fields': {'name': 'Stale'}, 'version': 1},
+        {'op': 'delete', 'id': b['id']},
+        {'op': 'delete', 'id': b['id']},
+        {'op': 'merge', 'id': a['id']},
+    ]})
+    result = r.get_json()
+    assert [item['status'] for item in result['results']] == [200, 412, 204, 404, 400]
+    assert (result['applied'], result['failed']) == (2, 3)
+    assert result['results'][1]['version'] == 2
+    lead = client.get('/api/leads?limit=100', headers=AUTH).get_json()['leads'][0]
+    assert (lead['id'], lead['status'], lead['name']) == (a['id'], 'Converted', 'Lead 1')
+    assert client.post('/api/leads/batch', headers=AUTH, json={'operations': []}).status_code == 400
+
+
+def test_upsert_matches_normalised_email_then_phone(client):
+    lead = add(client, 1)
+    r = client.post('/api/leads?upsert=true', headers=AUTH, json={'name': 'Again', 'email': '  LEAD1@Example.com ',
+                                                                  'phone': '555-0101', 'status': 'In Progress'})
+    assert r.status_code == 200 and r.get_json()['id'] == lead['id'] and r.get_json()['status'] == 'In Progress'
+    r = client.post('/api/leads?upsert=true', headers=AUTH,
+                    json={'name': 'By phone', 'email': 'other@example.com', 'phone': '(555) 0101'})
+    assert r.status_code == 200 and r.get_json()['id'] == lead['id']
+    r = client.post('/api/leads?upsert=true', headers=AUTH,
+                    json={'name': 'New one', 'email': 'new@example.com', 'phone': '999'})
+    assert r.status_code == 201 and r.get_json()['id'] != lead['id']
+
+
+def test_stats_follow_writes(client):
+    before = client.get('/api/leads/stats', headers=AUTH).get_json()['by_status']
+    lead = add(client, 1)
+    add(client, 2, status='Converted')
+    client.patch(f"/api/leads/{lead['id']}", headers=AUTH, json={'status': 'In Progress'})
+    client.post('/api/leads/bulk', headers=AUTH, data=json.dumps({'name': 'X', 'email': 'x@example.com', 'phone': '7'}),
+                content_type='application/x-ndjson')
+    r = client.get('/api/leads/stats', headers=AUTH).get_json()
+    assert r['by_status'] == {'New': before['New'] + 1, 'In Progress': before['In Progress'] + 1,
+                              'Converted': before['Converted'] + 1}
+    assert r['total'] == sum(before.values()) + 3
+    client.delete(f"/api/leads/{lead['id']}", headers=AUTH)
+    assert client.get('/api/leads/stats', headers=AUTH).get_json()['by_status']['In Progress'] == before['In Progress']
+
+
+def test_reconcile_corrects_drifted_sqlite_counters(tmp_path):
+    repo = sqlite_repo(tmp_path)
+    client = make_client(repo)
+    actual = client.get('/api/leads/stats', headers=AUTH).get_json()['by_status']
+    conn = repo.connect()
+    conn.execute("UPDATE counters SET value = value + 5 WHERE name = 'status:New'")
+    conn.commit()
+    conn.close()
+    assert client.get('/api/leads/stats', headers=AUTH).get_json()['by_status']['New'] == actual['New'] + 5
+    assert repo.reconcile_stats() == {'New': (actual['New'] + 5, actual['New'])}
+    assert client.get('/api/leads/stats', headers=AUTH).get_json()['by_status'] == actual
+    assert repo.reconcile_stats() == {}
+    repo.close()
+
+
+def test_login_and_rehash(repo, client):
+    r = client.post('/api/auth/login', json={'email': ' Test@Example.com', 'password': DEFAULT_USER['password']})
+    assert r.status_code == 200 and r.get_json()['token']
+    assert passwords.is_hashed(repo.get_password_hash(DEFAULT_USER['email']))
+    assert client.post('/api/auth/login', json={**DEFAULT_USER, 'password': 'wrong'}).status_code == 401
+    assert client.get('/api/leads').status_code == 401
+
+
+def test_login_sheds_when_the_password_queue_is_full(client):
+    passwords._executor()  # this process's queue slots
+    slots = passwords._slots
+    for _ in range(passwords.PASSWORD_QUEUE_LIMIT):
+        slots.acquire()
+    try:
+        r = client.post('/api/auth/login', json={**DEFAULT_USER, 'password': 'wrong'})
+        assert r.status_code == 503 and r.headers['Retry-After'] == '1'
+    finally:
+        for _ in range(passwords.PASSWORD_QUEUE_LIMIT):
+            slots.release()
+    assert client.post('/api/auth/login', json={**DEFAULT_USER, 'password': 'wrong'}).status_code == 401
+
+
+def test_rate_limits(repo):
+    client = make_client(repo, limiter=Limiter(MemoryBuckets(), ip='1000/1000', sub='1/2', login='1/1',
+                                               enabled=True))
+    assert [client.get('/api/leads', headers=AUTH).status_code for _ in range(3)] == [200, 200, 429]
+    assert client.get('/api/leads', headers=AUTH).headers['Retry-After'] == '1'
+    assert client.post('/api/auth/login', json={}).status_code == 401
+    assert client.post('/api/auth/login', json={}).status_code == 429
+    assert client.get('/api/leads?limit=100000', headers={'Authorization': 'Bearer ' + token_for('other@example.com')}
+                      ).get_json()['limit'] == 1000
+
+
+def test_per_ip_limits_use_the_forwarded_address_behind_trusted_proxies(repo):
+    def logins(trusted_proxies):
+        client = make_client(repo, limiter=Limiter(MemoryBuckets(), login='1/1', enabled=True,
+                                                   trusted_proxies=trusted_proxies))
+        return [client.post('/api/auth/login', json={}, headers={'X-Forwarded-For': f'203.0.113.{n}'}).status_code
+                for n in range(3)]
+
+    assert logins(0) == [401, 429, 429]  # one bucket: every request comes from the proxy
+    assert logins(1) == [401, 401, 401]
+
+
+def test_inflight_cap_sheds_with_503(repo):
+    limiter = Limiter(MemoryBuckets(), max_inflight=1, enabled=True)
+    client = make_client(repo, limiter=limiter)
+    slots = limiter.slots('leads.get_leads')
+    slots.acquire()  # one request already in flight
+    try:
+        r = client.get('/api/leads', headers=AUTH)
+        assert r.status_code == 503 and r.headers['Retry-After'] == '1'
+    finally:
+        slots.release()
+    assert client.get('/api/leads', headers=AUTH).status_code == 200
+
+
+def test_concurrent_writes_all_land(repo, client):
+    errors = []
+
+    def writer(n):
+        r = client.post('/api/leads', headers=AUTH,
+                        json={'name': f'T{n}', 'email': f't{n}@example.com', 'phone': f'8{n:03}'})
+        if r.status_code != 201:
+            errors.append(r.status_code)
+
+    before = client.get('/api/leads/stats', headers=AUTH).get_json()['total']
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert client.get('/api/leads/stats', headers=AUTH).get_json()['total'] == before + 20
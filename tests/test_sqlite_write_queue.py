@@ -0,0 +1,102 @@
+# The SQLite writer thread: grouped writes and batches, and what callers see when it dies
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from leads.common import plan_batch
+from leads.sqlite import SQLiteRepository, WriteQueue
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / 'leads.db'))
+    repo.init_schema()
+    yield repo
+    repo.close()
+
+
+def test_apply_batch_through_the_writer(repo):
+    lead = repo.add_lead({'name': 'A', 'email': 'a@example.com', 'phone': '1', 'status': 'New'})
+    lead_id = int(lead['id'])
+    results = repo.apply_batch([('update', lead_id, {'status': 'Converted'}, None),
+                                ('update', lead_id, {'name': 'B'}, 1),  # stale: now at version 2
+                                ('delete', lead_id + 1000, {}, None)])
+    assert [status for status, _ in results] == [200, 412, 404]
+    assert repo.get_lead(lead_id)['status'] == 'Converted'
+
+
+def test_plan_batch_replays_in_order():
+    results, updates, deleted = plan_batch([('update', 1, {'status': 'Converted'}, 1),
+                                            ('update', 1, {'name': 'B'}, 2),
+                                            ('delete', 2, {}, 5)], {1: 1, 2: 3})
+    assert results == [(200, 2), (200, 3), (412, 3)]
+    assert updates == {1: ({'status': 'Converted', 'name': 'B'}, 2)}
+    assert deleted == []
+
+
+def test_connect_failure_fails_the_write_and_the_next_one_restarts(repo, monkeypatch):
+    connect = repo._connect
+
+    def broken():
+        raise sqlite3.OperationalError('unable to open database file')
+
+    monkeypatch.setattr(repo, '_connect', broken)
+    with pytest.raises(sqlite3.OperationalError):
+        repo._submit(lambda conn: 1)
+    dead = repo._writer
+    assert dead.error is not None
+    with pytest.raises(sqlite3.OperationalError):
+        dead.submit(lambda conn: 1)  # later jobs on the dead writer fail at once
+
+    monkeypatch.setattr(repo, '_connect', connect)
+    assert repo._submit(lambda conn: conn.execute('SELECT 1').fetchone()[0]) == 1
+    assert repo._writer is not dead
+
+
+def test_writer_dying_fails_queued_and_later_jobs(repo, monkeypatch):
+    started, release, errors = threading.Event(), threading.Event(), []
+    commit = WriteQueue._commit
+
+    def commit_then_crash(self, conn, jobs):
+        commit(self, conn, jobs)
+        raise RuntimeError('writer crashed')
+
+    def queued():
+        try:
+            writer.submit(lambda conn: 2)
+        except RuntimeError as e:
+            errors.append(e)
+
+    monkeypatch.setattr(WriteQueue, '_commit', commit_then_crash)
+    writer = WriteQueue(repo, timeout=5)
+    first = threading.Thread(target=writer.submit, args=(lambda conn: (started.set(), release.wait(5)),))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=queued)
+    second.start()
+    time.sleep(0.05)  # second is queued behind the running job
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert not second.is_alive() and 'writer crashed' in str(errors[0])
+    with pytest.raises(RuntimeError, match='writer crashed'):
+        writer.submit(lambda conn: 3)
+
+
+def test_wait_is_bounded_and_a_timed_out_job_never_runs(repo):
+    writer = WriteQueue(repo, timeout=5)
+    release, ran = threading.Event(), []
+    blocker = threading.Thread(target=lambda: writer.submit(lambda conn: release.wait(5)))
+    blocker.start()
+    time.sleep(0.02)
+    writer.timeout = 0.1
+    with pytest.raises(TimeoutError):
+        writer.submit(lambda conn: ran.append(1))
+    writer.timeout = 5
+    release.set()
+    blocker.join()
+    assert writer.submit(lambda conn: 2) == 2
+    assert ran == []
+    writer.stop()